@@ -0,0 +1,80 @@
+# server/config.py
+# Runtime settings, overridable through environment variables.
+import os
+
+# --- MICRO-BATCHING (/recommend) ---
+# Requests arriving within BATCH_WINDOW_MS of each other share one ViT and one NeuMF pass.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+
+# --- PRELOAD (multi-worker deployments, see gunicorn.conf.py) ---
+# Load the ViT, MTCNN, recommender and catalog once at import, in the master process,
+# with their tensors in shared memory; forked workers then share them copy-on-write.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "0") == "1"
+
+# --- VISION WORKER POOL (decode, MTCNN, crop, ViT) ---
+# "process" isolates each model in its own interpreter; "thread" shares one process;
+# "shared" runs threads over the single preloaded classifier (the default with PRELOAD_MODELS).
+VISION_POOL_MODE = os.getenv("VISION_POOL_MODE", "shared" if PRELOAD_MODELS else "process")
+VISION_WORKERS = int(os.getenv("VISION_WORKERS", "2"))
+# Torch intra-op threads split evenly across vision workers (defaults to all cores)
+VISION_TOTAL_THREADS = int(os.getenv("VISION_TOTAL_THREADS", str(os.cpu_count() or 1)))
+
+# --- RECOMMENDATION SCORER ---
+# "auto" times every exported artifact (scripts/export_recommender.py) against eager and keeps the fastest.
+RECOMMENDER_BACKEND = os.getenv("RECOMMENDER_BACKEND", "auto")
+# Two-stage retrieval: catalogs larger than 2x this many items only run the full head on
+# the top (and bottom) RETRIEVAL_CANDIDATES items from a per-face-shape GMF index. 0 disables.
+# Pick the value with scripts/retrieval_recall.py.
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "512"))
+# Items whose width is within this of face_hw pass the candidate width-fit filter
+RETRIEVAL_WIDTH_TOLERANCE = float(os.getenv("RETRIEVAL_WIDTH_TOLERANCE", "0.25"))
+
+# --- FACE-SHAPE CLASSIFIER ---
+VIT_MODEL_NAME = "metadome/face_shape_classification"
+# "fp32" (default), "int8" (dynamic quantization of Linear layers) or "bf16" (bf16 weights, needs native CPU support).
+VIT_PRECISION = os.getenv("VIT_PRECISION", "fp32")
+# Local copy of the ViT weights/config written by scripts/snapshot_vit.py
+VIT_SNAPSHOT_DIR = os.getenv("VIT_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "vit_snapshot"))
+# Refuse to contact the HuggingFace hub when no snapshot is present
+VIT_OFFLINE = os.getenv("VIT_OFFLINE", "0") == "1"
+
+# --- IMAGE INGEST ---
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(50_000_000)))
+# JPEGs decode at a reduced scale and larger images are shrunk to about this many pixels per side
+DECODE_MAX_SIDE = int(os.getenv("DECODE_MAX_SIDE", "1024"))
+# MTCNN runs on a copy no larger than this; boxes are mapped back to the decoded image
+DETECT_MAX_SIDE = int(os.getenv("DETECT_MAX_SIDE", "480"))
+
+# --- CLASSIFICATION CACHE (keyed by a hash of the uploaded bytes, namespaced by the ViT and ingest settings) ---
+# "memory" (per process), "disk" (SQLite file shared by all workers on the host) or "off"
+CLASSIFICATION_CACHE = os.getenv("CLASSIFICATION_CACHE", "memory")
+CLASSIFICATION_CACHE_MAX_BYTES = int(os.getenv("CLASSIFICATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+CLASSIFICATION_CACHE_TTL_SECONDS = float(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", "3600"))
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH", "./cache/classification.db")
+
+# --- RE-RANK SESSIONS (/recommend returns a token, /rerank reuses the classified face) ---
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+
+# --- FEEDBACK WRITER (group commit to feedback.db) ---
+FEEDBACK_BATCH_SIZE = int(os.getenv("FEEDBACK_BATCH_SIZE", "256"))
+FEEDBACK_FLUSH_MS = float(os.getenv("FEEDBACK_FLUSH_MS", "50"))
+FEEDBACK_QUEUE_SIZE = int(os.getenv("FEEDBACK_QUEUE_SIZE", "10000"))
+# How long /feedback waits for queue space before answering 503
+FEEDBACK_ENQUEUE_TIMEOUT = float(os.getenv("FEEDBACK_ENQUEUE_TIMEOUT", "1.0"))
+# Upper bound on events accepted by one /feedback/batch call
+FEEDBACK_BATCH_MAX_ROWS = int(os.getenv("FEEDBACK_BATCH_MAX_ROWS", "10000"))
+# Body size cap for /feedback/batch, checked before parsing (an event is ~100 bytes of JSON)
+FEEDBACK_BATCH_MAX_BYTES = int(os.getenv("FEEDBACK_BATCH_MAX_BYTES", str(FEEDBACK_BATCH_MAX_ROWS * 512)))
+
+# --- MODEL HOT RELOAD ---
+# How often the registry checks server/checkpoints and the catalog file for a new version (0 disables)
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "10"))
+
+# --- LOGGING ---
+# Per-request detail (scores, predictions) is logged at DEBUG and skipped entirely above it
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "json" (one object per line) or "text"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
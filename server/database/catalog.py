@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import torch
+
+# Column order of the item feature matrix (matches HybridNeuMF's item_processor input)
+ITEM_FEATURE_KEYS = ["width", "height", "bridge_pos", "normalized_material", "normalized_rim"]
+ITEM_FEATURE_DEFAULTS = [0.5, 0.5, 0.5, 0.0, 0.0]
+WIDTH_COLUMN = 0
+
+# Binary catalog layout (a directory of .npy files plus meta.json); bump on incompatible changes
+CATALOG_SCHEMA_VERSION = 1
+BINARY_SUFFIX = ".catalog"
+META_FILE = "meta.json"
+
+def binary_path_for(json_path):
+    """glasses_database.json -> glasses_database.catalog (the directory written next to it)."""
+    return os.path.splitext(json_path)[0] + BINARY_SUFFIX
+
+def features_fingerprint(features):
+    """Short content hash of an item feature matrix; exported scorers are tied to it."""
+    return hashlib.sha256(np.ascontiguousarray(features, dtype=np.float32).tobytes()).hexdigest()[:16]
+
+class StringTable:
+    """
+    Read-only list of strings stored as one UTF-8 byte buffer plus (n + 1) offsets.
+    Both arrays can be memory-mapped; a string is only decoded when it is looked up.
+    """
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [str(value).encode("utf-8") for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, data)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return bytes(self.data[start:end]).decode("utf-8")
+
+class GlassesCatalog:
+    """
+    Columnar, read-only view of the glasses catalog.
+
+    Item features live in one contiguous float32 (num_items, 5) array ordered by
+    glass id, with parallel arrays for the frame shape id, name and file name.
+    Everything that runs per request is a vectorized operation over these arrays.
+    """
+    def __init__(self, features, shape_ids, names, file_names, fingerprint=None):
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self.shape_ids = np.ascontiguousarray(shape_ids, dtype=np.int64)
+        self.names = names if isinstance(names, StringTable) else np.asarray(names, dtype=object)
+        self.file_names = file_names if isinstance(file_names, StringTable) else np.asarray(file_names, dtype=object)
+        # Zero-copy torch view shared with the numpy array
+        self.item_feature_tensor = torch.from_numpy(self.features)
+        self._fingerprint = fingerprint
+
+    @classmethod
+    def from_dict(cls, glasses_db):
+        """Builds the catalog from the JSON layout: {"0": {...}, "1": {...}, ...}."""
+        num_items = len(glasses_db)
+        features = np.empty((num_items, len(ITEM_FEATURE_KEYS)), dtype=np.float32)
+        shape_ids = np.full(num_items, -1, dtype=np.int64)
+        names = []
+        file_names = []
+
+        for i in range(num_items):
+            g = glasses_db.get(str(i), {})
+            features[i] = [g.get(key, default) for key, default in zip(ITEM_FEATURE_KEYS, ITEM_FEATURE_DEFAULTS)]
+            shape_ids[i] = g.get("shape_id", -1)
+            names.append(g.get("name", f"Model {i}"))
+            file_names.append(g.get("file_name", ""))
+
+        return cls(features, shape_ids, names, file_names)
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, "r") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_binary(cls, path):
+        """
+        Memory-maps a catalog directory written by save_binary. Arrays are opened
+        copy-on-write, so every process reading the same file shares its pages and
+        nothing is parsed or copied up front.
+        """
+        with open(os.path.join(path, META_FILE), "r") as f:
+            meta = json.load(f)
+        if meta.get("schema_version") != CATALOG_SCHEMA_VERSION:
+            raise ValueError(f"{path} has catalog schema {meta.get('schema_version')}, expected {CATALOG_SCHEMA_VERSION}")
+        if meta.get("feature_keys") != ITEM_FEATURE_KEYS:
+            raise ValueError(f"{path} has feature columns {meta.get('feature_keys')}, expected {ITEM_FEATURE_KEYS}")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="c")
+
+        return cls(
+            load("features"),
+            load("shape_ids"),
+            StringTable(load("names_offsets"), load("names_data")),
+            StringTable(load("file_names_offsets"), load("file_names_data")),
+            fingerprint=meta.get("fingerprint")
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Opens a catalog from a binary directory or a JSON file. For a JSON path the
+        binary directory next to it is preferred when it is at least as new.
+        """
+        if os.path.isdir(path):
+            return cls.from_binary(path)
+        binary_path = binary_path_for(path)
+        meta_path = os.path.join(binary_path, META_FILE)
+        if os.path.exists(meta_path) and (not os.path.exists(path) or os.path.getmtime(meta_path) >= os.path.getmtime(path)):
+            return cls.from_binary(binary_path)
+        return cls.from_json(path)
+
+    def save_binary(self, path):
+        """
+        Writes the columnar binary layout: features.npy, shape_ids.npy, an offsets +
+        UTF-8 data pair per string column and meta.json with the schema version.
+        The directory is built aside and swapped in, so readers never see a partial catalog.
+        """
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        names = self.names if isinstance(self.names, StringTable) else StringTable.from_strings(self.names)
+        file_names = self.file_names if isinstance(self.file_names, StringTable) else StringTable.from_strings(self.file_names)
+        arrays = {
+            "features": self.features,
+            "shape_ids": self.shape_ids,
+            "names_offsets": names.offsets,
+            "names_data": names.data,
+            "file_names_offsets": file_names.offsets,
+            "file_names_data": file_names.data,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, META_FILE), "w") as f:
+            json.dump({
+                "schema_version": CATALOG_SCHEMA_VERSION,
+                "num_items": len(self),
+                "feature_keys": ITEM_FEATURE_KEYS,
+                "fingerprint": self.fingerprint
+            }, f, indent=4)
+
+        # Processes that still map the old files keep them alive until they let go
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, len(ITEM_FEATURE_KEYS))), np.zeros(0), [], [])
+
+    def __len__(self):
+        return self.features.shape[0]
+
+    @property
+    def fingerprint(self):
+        """Short content hash of the item features; exported scorers are tied to it."""
+        if self._fingerprint is None:
+            self._fingerprint = features_fingerprint(self.features)
+        return self._fingerprint
+
+    @property
+    def widths(self):
+        return self.features[:, WIDTH_COLUMN]
+
+    def client_features(self, base_vectors, item_ids=None):
+        """
+        Broadcasts base client vectors [cheek_jaw, face_hw, midface] against every item
+        and appends the engineered width_diff = |face_hw - item width| column.
+
+        base_vectors: (3,) or (B, 3). Returns float32 (num_items, 4) or (B, num_items, 4).
+        With item_ids (B, N) only those items are used and the result is (B, N, 4).
+        """
+        base = np.asarray(base_vectors, dtype=np.float32)
+        single = base.ndim == 1 and item_ids is None
+        base = base.reshape(-1, 3)
+        widths = self.widths[None, :] if item_ids is None else self.widths[np.asarray(item_ids)]
+
+        out = np.empty((base.shape[0], widths.shape[1], 4), dtype=np.float32)
+        out[..., :3] = base[:, None, :]
+        np.abs(base[:, 1:2] - widths, out=out[..., 3])
+        return out[0] if single else out
+
+    def describe(self, glass_id):
+        """Response metadata for a single item."""
+        return {
+            "glass_id": int(glass_id),
+            "name": self.names[glass_id],
+            "file_name": self.file_names[glass_id],
+        }
@@ -1,7 +1,35 @@
+import asyncio
+import os
+import queue
 import sqlite3
+import threading
+import time
+from services.logs import get_logger
+from services.metrics import STAGE_SECONDS, ERRORS
+
+# Overridable so benchmarks and tests never write into the real feedback table
+DB_PATH = os.getenv("FEEDBACK_DB_PATH", "feedback.db")
+
+logger = get_logger("feedback")
+
+INSERT_FEEDBACK_SQL = '''
+    INSERT INTO feedback (glass_id, detected_face_shape_id, cheek_jaw_ratio, face_hw_ratio, midface_ratio, liked)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+def feedback_row(glass_id: int, shape_id: int, features: list, liked: bool):
+    return (glass_id, shape_id, features[0], features[1], features[2], liked)
+
+def apply_pragmas(conn):
+    """WAL lets readers (training, analytics) run alongside the writer; NORMAL sync is durable with WAL."""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=5000")
 
 def init_db():
-    conn = sqlite3.connect("feedback.db")
+    conn = sqlite3.connect(DB_PATH)
+    apply_pragmas(conn)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS feedback (
@@ -20,11 +48,115 @@ def init_db():
     conn.close()
 
 def save_user_feedback(glass_id: int, shape_id: int, features: list, liked: bool):
-    conn = sqlite3.connect("feedback.db")
+    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO feedback (glass_id, detected_face_shape_id, cheek_jaw_ratio, face_hw_ratio, midface_ratio, liked)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (glass_id, shape_id, features[0], features[1], features[2], liked))
+    cursor.execute(INSERT_FEEDBACK_SQL, feedback_row(glass_id, shape_id, features, liked))
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+def save_feedback_batch(rows: list):
+    """Inserts many feedback rows (see feedback_row) in one executemany transaction."""
+    conn = sqlite3.connect(DB_PATH)
+    apply_pragmas(conn)
+    try:
+        with STAGE_SECONDS.time(stage="feedback_write"), conn:
+            conn.executemany(INSERT_FEEDBACK_SQL, rows)
+    except sqlite3.Error:
+        ERRORS.inc(stage="feedback_write")
+        raise
+    finally:
+        conn.close()
+
+class FeedbackQueueFull(Exception):
+    """Raised when the writer queue stays full for longer than the caller is willing to wait."""
+
+class FeedbackWriter:
+    """
+    Single long-lived SQLite writer thread. Rows are queued in memory and
+    group-committed every `batch_size` rows or `flush_interval_ms`, whichever
+    comes first, so a burst of clicks costs one transaction instead of one each.
+    """
+    _STOP = object()
+
+    def __init__(self, db_path=DB_PATH, batch_size=256, flush_interval_ms=50, max_queue=10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="feedback-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flushes everything still queued, then stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    async def enqueue(self, row, timeout=1.0):
+        """
+        Queues one row without blocking the event loop. While the queue is full the
+        caller waits (backpressure) up to `timeout` seconds, then FeedbackQueueFull.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self._queue.put_nowait(row)
+                return
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    raise FeedbackQueueFull()
+                await asyncio.sleep(0.005)
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        apply_pragmas(conn)
+        stopping = False
+        try:
+            while not stopping:
+                first = self._queue.get()
+                if first is self._STOP:
+                    break
+                batch = [first]
+
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        row = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if row is self._STOP:
+                        stopping = True
+                        break
+                    batch.append(row)
+
+                self._write(conn, batch)
+
+            # Drain anything that raced in behind the stop marker
+            leftover = []
+            while True:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is not self._STOP:
+                    leftover.append(row)
+            if leftover:
+                self._write(conn, leftover)
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with STAGE_SECONDS.time(stage="feedback_write"), conn:
+                conn.executemany(INSERT_FEEDBACK_SQL, batch)
+        except sqlite3.Error as e:
+            ERRORS.inc(stage="feedback_write")
+            logger.error("feedback_write_failed", extra={"fields": {"rows": len(batch), "error": str(e)}})
@@ -0,0 +1,15 @@
+# server/gunicorn.conf.py
+# Multi-worker deployment with models preloaded once and shared copy-on-write:
+#   gunicorn -c gunicorn.conf.py main:app
+# Check the per-worker saving with scripts/memory_report.py.
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import main.py (and load every model) in the master before forking the workers
+preload_app = True
+
+os.environ.setdefault("PRELOAD_MODELS", "1")
+# Split the cores between workers instead of giving each of them all of them
+os.environ.setdefault("VISION_TOTAL_THREADS", str(max(1, (os.cpu_count() or 1) // workers)))
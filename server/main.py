@@ -1,12 +1,26 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import torch
 import json
+import math
 import os
-from services.classifier import classifier_service
-from models.model import HybridNeuMF
-from pydantic import BaseModel
-from database.database import save_user_feedback, init_db
+import config
+import asyncio
+import logging
+from services.batching import MicroBatcher
+from services.logs import configure_logging, get_logger
+from services.metrics import REGISTRY, STAGE_SECONDS, ERRORS, FALLBACKS, PREDICTED_SHAPES
+from services.vision_pool import VisionWorkerPool
+from services.classification_cache import build_classification_cache, pipeline_namespace
+from services.shared_memory import share_module_memory, freeze_heap
+from services.sessions import SessionStore
+from models.registry import ModelRegistry
+from pydantic import BaseModel, ValidationError
+from database.database import init_db, feedback_row, save_feedback_batch, FeedbackWriter, FeedbackQueueFull
+
+configure_logging(config.LOG_LEVEL, config.LOG_FORMAT)
+logger = get_logger("api")
 
 app = FastAPI()
 
@@ -23,24 +37,26 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     init_db()
+    feedback_writer.start()
+    vision_pool.start()
+    await recommend_batcher.start()
+    model_registry.start_watching()
+    # Models load and warm in the background; /ready reports when they are done
+    readiness["task"] = asyncio.create_task(warm_up_models())
 
-# --- DATABASE LOADING ---
-db_path = "./database/glasses_database.json"
-try:
-    with open(db_path, "r") as f:
-        glasses_db = json.load(f)
-    print(f" ✅ Loaded {len(glasses_db)} glasses from database.")
-except FileNotFoundError:
-    print(f" ❌ ERROR: {db_path} not found!")
-    glasses_db = {}
+@app.on_event("shutdown")
+async def shutdown_event():
+    await model_registry.stop_watching()
+    await recommend_batcher.stop()
+    vision_pool.shutdown()
+    # Flush queued feedback before the process exits
+    await asyncio.to_thread(feedback_writer.stop)
 
 # --- MODEL CONFIGURATION ---
-NUM_SHAPES = 5
-NUM_ITEMS = len(glasses_db) if glasses_db else 45
-# Client features = 4 (cheek_jaw, face_hw, midface + width_diff engineered feature)
-NUM_CLIENT_FEATURES = 4 
-NUM_ITEM_FEATURES = 5
-FACTOR_NUM = 32
+# Sizes (num_items, feature counts, factor_num) come from the checkpoint / exported artifact.
+# The memory-mapped binary copy next to it (glasses_database.catalog) is preferred when present
+CATALOG_PATH = "./database/glasses_database.json"
+ARTIFACT_DIR = "./artifacts"
 FACE_MAP = {"Heart": 0, "Oblong": 1, "Oval": 2, "Round": 3, "Square": 4}
 
 class FeedbackRequest(BaseModel):
@@ -49,113 +65,482 @@ class FeedbackRequest(BaseModel):
     features: list[float]
     liked: bool
 
+class RerankRequest(BaseModel):
+    session_token: str
+    cheek_jaw_ratio: float = 1.0
+    face_hw_ratio: float = 1.0
+    midface_ratio: float = 1.0
+
+if config.PRELOAD_MODELS:
+    # The master must not start an intra-op thread pool before it forks (OpenMP is not
+    # fork-safe); each worker sizes its own pool when its vision pool starts.
+    torch.set_num_threads(1)
+
 # --- MODEL LOADING ---
-try:
-    model = HybridNeuMF(
-        num_face_shapes=NUM_SHAPES, 
-        num_items=NUM_ITEMS, 
-        num_client_features=NUM_CLIENT_FEATURES, 
-        num_item_features=NUM_ITEM_FEATURES,
-        factor_num=FACTOR_NUM
+# The newest versioned checkpoint (or spectacular_hybrid.pth) is loaded now; retrained
+# checkpoints and catalog edits are picked up in the background and swapped in live.
+model_registry = ModelRegistry(
+    CATALOG_PATH,
+    ARTIFACT_DIR,
+    backend=config.RECOMMENDER_BACKEND,
+    poll_seconds=config.MODEL_POLL_SECONDS,
+    retrieval_candidates=config.RETRIEVAL_CANDIDATES,
+    width_tolerance=config.RETRIEVAL_WIDTH_TOLERANCE
+)
+model_registry.reload()
+if model_registry.current is None:
+    logger.critical("model_unavailable", extra={"fields": {"checkpoint_dir": model_registry.checkpoint_dir}})
+
+def active_model():
+    """The model version a request is served by; read once so a reload can't change it mid-request."""
+    active = model_registry.current
+    if active is None:
+        raise HTTPException(status_code=500, detail="Recommendation model not loaded.")
+    return active
+
+def select_matches(catalog, scores, k=5, item_ids=None, largest=True):
+    """
+    k result dicts for the highest (or lowest) scores, ordered highest to lowest.
+    item_ids maps score positions to glass ids when only candidates were scored.
+    """
+    k = min(k, scores.shape[0])
+    values, positions = torch.topk(scores, k, largest=largest)
+    if not largest:
+        values, positions = values.flip(0), positions.flip(0)
+    ids = positions if item_ids is None else item_ids[positions]
+    return [
+        {**catalog.describe(i), "score": round(score, 4)}
+        for i, score in zip(ids.tolist(), values.tolist())
+    ]
+
+def rank_matches(catalog, scores, k=5):
+    """Returns (top_k, bottom_k) result dicts over a full-catalog score vector."""
+    return select_matches(catalog, scores, k), select_matches(catalog, scores, k, largest=False)
+
+def rerank_candidates(active, shape_tensor, base_vectors, k=5):
+    """
+    Two-stage path for large catalogs: the GMF index retrieves the best and worst
+    candidates per request and only those go through the full head.
+    Returns one (top_k, bottom_k) pair per request.
+    """
+    retriever = active.retriever
+    face_hw = torch.tensor([vec[1] for vec in base_vectors], dtype=torch.float32)
+    top_ids = retriever.candidates(shape_tensor, face_hw)
+    low_ids = retriever.candidates(shape_tensor, face_hw, largest=False)
+    item_ids = torch.cat([top_ids, low_ids], dim=1)
+
+    with STAGE_SECONDS.time(stage="feature_build"):
+        client_feat_tensor = torch.from_numpy(active.catalog.client_features(base_vectors, item_ids.numpy()))
+    with STAGE_SECONDS.time(stage="neumf_forward"):
+        predictions = active.scorer.score_candidates(shape_tensor, client_feat_tensor, item_ids)
+
+    split = top_ids.shape[1]
+    with STAGE_SECONDS.time(stage="rank_serialize"):
+        return [
+            (
+                select_matches(active.catalog, predictions[row, :split], k, top_ids[row]),
+                select_matches(active.catalog, predictions[row, split:], k, low_ids[row], largest=False)
+            )
+            for row in range(len(base_vectors))
+        ]
+
+# --- VISION WORKER POOL: image pipeline never runs on the event loop ---
+vision_pool = VisionWorkerPool(
+    mode=config.VISION_POOL_MODE,
+    workers=config.VISION_WORKERS,
+    total_threads=config.VISION_TOTAL_THREADS,
+    cache=build_classification_cache(
+        config.CLASSIFICATION_CACHE,
+        max_bytes=config.CLASSIFICATION_CACHE_MAX_BYTES,
+        ttl_seconds=config.CLASSIFICATION_CACHE_TTL_SECONDS,
+        disk_path=config.CLASSIFICATION_CACHE_PATH,
+        namespace=pipeline_namespace(
+            config.VIT_MODEL_NAME, config.VIT_SNAPSHOT_DIR, config.VIT_PRECISION,
+            config.DECODE_MAX_SIDE, config.DETECT_MAX_SIDE
+        )
     )
-    # Load weights trained with BCELoss
-    model.load_state_dict(torch.load("spectacular_hybrid.pth", map_location=torch.device('cpu')))
-    model.eval()
-    print(" ✅ Hybrid NeuMF Model Loaded Successfully!")
-except Exception as e:
-    print(f" ❌ CRITICAL: Could not load model. Error: {e}")
-    model = None
+)
+
+def preload_shared_models():
+    """
+    PRELOAD_MODELS: builds the process-wide classifier next to the recommender, moves
+    their tensors into shared memory and freezes the heap, so workers forked from this
+    process map one copy of every weight instead of loading their own.
+    """
+    from services.classifier import get_classifier
+
+    classifier = get_classifier()
+    modules = [classifier.mtcnn, classifier.model]
+    if model_registry.current is not None:
+        backend = model_registry.current.scorer
+        modules.append(getattr(backend, "scorer", None) or getattr(backend, "module", None))
+
+    shared_bytes = sum(share_module_memory(module) for module in modules if isinstance(module, torch.nn.Module))
+    frozen = freeze_heap()
+    logger.info("models_preloaded", extra={"fields": {
+        "shared_mb": round(shared_bytes / 1e6, 1),
+        "frozen_objects": frozen
+    }})
+
+def score_recommendation_batch(active, face_shapes, base_vectors):
+    """
+    One NeuMF pass over (requests x items) for already-classified faces, all on
+    the same ModelVersion. Returns one response dict per request, in order.
+    """
+    catalog = active.catalog
+    shape_ids = []
+    for face_shape in face_shapes:
+        if face_shape not in FACE_MAP:
+            FALLBACKS.inc(reason="default_shape_id")
+        shape_ids.append(FACE_MAP.get(face_shape, 2))
+    shape_tensor = torch.tensor(shape_ids)
+
+    if active.retriever is not None:
+        ranked = rerank_candidates(active, shape_tensor, base_vectors, k=5)
+    else:
+        # 2. Prepare Tensors (width_diff is broadcast against the whole catalog at once)
+        with STAGE_SECONDS.time(stage="feature_build"):
+            client_feat_tensor = torch.from_numpy(catalog.client_features(base_vectors))
+
+        # 3. Generate Predictions (item tower is precomputed in the scorer)
+        with STAGE_SECONDS.time(stage="neumf_forward"):
+            predictions = active.scorer(shape_tensor, client_feat_tensor)
+
+        # 4. Select Highest and Lowest Results (only these are turned into dicts)
+        with STAGE_SECONDS.time(stage="rank_serialize"):
+            ranked = [rank_matches(catalog, predictions[row], k=5) for row in range(len(face_shapes))]
+
+    results = []
+    debug = logger.isEnabledFor(logging.DEBUG)
+    for row, face_shape in enumerate(face_shapes):
+        top_5, bottom_5 = ranked[row]
+
+        if debug:
+            logger.debug("recommendation", extra={"fields": {
+                "face_shape": face_shape,
+                "model_version": active.version,
+                "top_scores": [x['score'] for x in top_5],
+                "lowest_scores": [x['score'] for x in bottom_5]
+            }})
+
+        results.append({
+            "status": "success",
+            "detected_face_shape": face_shape, 
+            "top_matches": top_5,
+            "lowest_matches": bottom_5, # New field in JSON response
+            "detected_face_shape_id": shape_ids[row],
+            "model_version": active.version
+        })
+
+    return results
+
+async def run_recommendation_batch(requests):
+    """
+    Scores a micro-batch of (image_bytes, base_client_vector) requests with one
+    batched ViT pass in the vision pool and one NeuMF pass over (requests x items).
+    Returns one response dict (or Exception) per request, in order.
+    """
+    active = active_model()
+
+    # 1. Detect Face Shapes (decode + MTCNN + one batched ViT forward, in a worker)
+    results = await vision_pool.analyze([contents for contents, _ in requests])
+    owners = []
+    for idx, result in enumerate(results):
+        if isinstance(result, Exception):
+            ERRORS.inc(stage="vision")
+            continue
+        owners.append(idx)
+        PREDICTED_SHAPES.inc(face_shape=result.face_shape)
+        if not result.face_detected:
+            FALLBACKS.inc(reason="no_face_detected")
+    if not owners:
+        return results
+
+    face_shapes = [results[idx].face_shape for idx in owners]
+    base_vectors = [requests[idx][1] for idx in owners]
+    loop = asyncio.get_running_loop()
+    scored = await loop.run_in_executor(None, score_recommendation_batch, active, face_shapes, base_vectors)
+
+    # The classified face is kept so /rerank can re-score new measurements without the image
+    for idx, response in zip(owners, scored):
+        results[idx] = {**response, "session_token": sessions.create(results[idx])}
+    return results
+
+# --- SESSIONS: /rerank re-scores a classified face without re-uploading the photo ---
+sessions = SessionStore(max_sessions=config.SESSION_MAX_COUNT, ttl_seconds=config.SESSION_TTL_SECONDS)
+
+# --- MICRO-BATCHING: concurrent /recommend calls share one forward pass ---
+recommend_batcher = MicroBatcher(
+    run_recommendation_batch,
+    max_batch_size=config.BATCH_MAX_SIZE,
+    window_ms=config.BATCH_WINDOW_MS,
+    # One batch per vision worker can be in flight at once
+    max_in_flight=config.VISION_WORKERS
+)
+
+def parse_features_json(features: str):
+    try:
+        return json.loads(features)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON features format.")
+
+CLIENT_FEATURE_KEYS = ("cheek_jaw_ratio", "face_hw_ratio", "midface_ratio")
+
+def client_vector(feats_dict: dict):
+    """
+    Base client vector [cheek_jaw, face_hw, midface] from a features dict. Every ratio
+    is coerced to a finite float here, so a bad payload fails its own request with a
+    400 instead of the micro-batch it would have been scored with.
+    """
+    if not isinstance(feats_dict, dict):
+        raise HTTPException(status_code=400, detail="features must be a JSON object.")
+    vector = []
+    for key in CLIENT_FEATURE_KEYS:
+        try:
+            value = float(feats_dict.get(key, 1.0))
+        except (TypeError, ValueError):
+            value = math.nan
+        if not math.isfinite(value):
+            raise HTTPException(status_code=400, detail=f"{key} must be a finite number.")
+        vector.append(value)
+    return vector
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Reads an upload, rejecting anything over MAX_UPLOAD_BYTES before it reaches the decoder."""
+    with STAGE_SECONDS.time(stage="upload_read"):
+        contents = await file.read(config.MAX_UPLOAD_BYTES + 1)
+    if len(contents) > config.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Uploaded image is too large.")
+    return contents
+
+# --- READINESS ---
+# The recommender side is ready whenever the registry holds a version: it warms each one before swapping it in.
+readiness = {"vision": False, "task": None}
+
+async def warm_up_models():
+    try:
+        await vision_pool.warm_up()
+        readiness["vision"] = True
+        logger.info("models_warm")
+    except Exception as e:
+        logger.error("warm_up_failed", extra={"fields": {"error": str(e)}})
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 only once both the vision pipeline and the recommender are warm."""
+    active = model_registry.current
+    body = {"vision": readiness["vision"], "recommender": active is not None}
+    if active is not None:
+        body["model_version"] = active.version
+    if not (body["vision"] and body["recommender"]):
+        return JSONResponse(status_code=503, content={"status": "warming_up", **body})
+    return {"status": "ready", **body}
 
 @app.post("/recommend")
 async def recommend_glasses(
     file: UploadFile = File(...),
     features: str = Form(...) 
 ):
-    if not model:
-        raise HTTPException(status_code=500, detail="Recommendation model not loaded.")
+    active_model()
+
+    base_client_vector = client_vector(parse_features_json(features))
+    contents = await read_upload(file)
     
     try:
-        # 1. Detect Face Shape
-        contents = await file.read()
-        face_shape = classifier_service.predict(contents)
-        shape_id = FACE_MAP.get(face_shape, 2) 
+        return await recommend_batcher.submit((contents, base_client_vector))
 
-        # 2. Parse Face Features
-        try:
-            feats_dict = json.loads(features)
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON features format.")
-            
-        base_client_vector = [
-            feats_dict.get("cheek_jaw_ratio", 1.0),
-            feats_dict.get("face_hw_ratio", 1.0),
-            feats_dict.get("midface_ratio", 1.0)
-        ]
+    except Exception as e:
+        ERRORS.inc(stage="recommend")
+        logger.error("recommendation_failed", extra={"fields": {"error": str(e)}})
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # 3. Prepare Tensors
-        current_num_items = len(glasses_db) 
-        shape_tensor = torch.tensor([shape_id] * current_num_items)
-        item_ids_tensor = torch.tensor(range(current_num_items))
-        
-        item_feats_list = []
-        engineered_client_feats = []
-
-        for i in range(current_num_items):
-            g = glasses_db.get(str(i), {})
-            g_width = g.get("width", 0.5)
-            item_feats_list.append([
-                g_width, g.get("height", 0.5), g.get("bridge_pos", 0.5),
-                g.get("normalized_material", 0.0), g.get("normalized_rim", 0.0)
-            ])
-            width_diff = abs(base_client_vector[1] - g_width)
-            engineered_client_feats.append(base_client_vector + [width_diff])
-
-        client_feat_tensor = torch.tensor(engineered_client_feats, dtype=torch.float32)
-        item_feat_tensor = torch.tensor(item_feats_list, dtype=torch.float32)
-
-        # 4. Generate Predictions
-        with torch.no_grad():
-            predictions = model(shape_tensor, item_ids_tensor, client_feat_tensor, item_feat_tensor)
-
-        # 5. Format and Sort All Results
-        all_scored_items = []
-        for i, score in enumerate(predictions.tolist()):
-            meta = glasses_db.get(str(i), {})
-            all_scored_items.append({
-                "glass_id": i,
-                "name": meta.get("name", f"Model {i}"),
-                "file_name": meta.get("file_name", ""),
-                "score": round(score, 4)
-            })
-        
-        # Sort by score descending (Highest to Lowest)
-        all_scored_items.sort(key=lambda x: x["score"], reverse=True)
-
-        top_5 = all_scored_items[:5]
-        bottom_5 = all_scored_items[-5:] # Last 5 items in the sorted list
-
-        # Console Logs for debugging
-        print(f"\n--- RECOMMENDING FOR {face_shape.upper()} FACE ---")
-        print(f"TOP 5 SCORES: {[x['score'] for x in top_5]}")
-        print(f"LOWEST 5 SCORES: {[x['score'] for x in bottom_5]}")
-
-        return {
-            "status": "success",
-            "detected_face_shape": face_shape, 
-            "top_matches": top_5,
-            "lowest_matches": bottom_5, # New field in JSON response
-            "detected_face_shape_id": shape_id
-        }
+@app.post("/rerank")
+async def rerank_glasses(request: RerankRequest):
+    """
+    Re-ranks the catalog for a face classified by an earlier /recommend call, using
+    new measurements. Only the NeuMF scorer runs: no upload, decode, MTCNN or ViT.
+    """
+    analysis = sessions.get(request.session_token)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired session, upload the photo again.")
+    active = active_model()
+
+    base_client_vector = client_vector({key: getattr(request, key) for key in CLIENT_FEATURE_KEYS})
+    loop = asyncio.get_running_loop()
+    try:
+        scored = await loop.run_in_executor(
+            None, score_recommendation_batch, active, [analysis.face_shape], [base_client_vector]
+        )
+    except Exception as e:
+        ERRORS.inc(stage="rerank")
+        logger.error("rerank_failed", extra={"fields": {"error": str(e)}})
+        raise HTTPException(status_code=500, detail=str(e))
+    return {**scored[0], "session_token": request.session_token}
+
+@app.post("/recommend/batch")
+async def recommend_glasses_batch(
+    files: list[UploadFile] = File(...),
+    features: str = Form(...)
+):
+    """
+    Ranks several photos at once. `features` is a JSON array with one features
+    object per uploaded file, in the same order. All images go through one
+    batched classification and one NeuMF evaluation.
+    """
+    active_model()
 
+    feats_list = parse_features_json(features)
+    if not isinstance(feats_list, list) or len(feats_list) != len(files):
+        raise HTTPException(status_code=400, detail="features must be a JSON array with one entry per file.")
+    if not all(isinstance(feats_dict, dict) for feats_dict in feats_list):
+        raise HTTPException(status_code=400, detail="Each features entry must be a JSON object.")
+    base_vectors = [client_vector(feats_dict) for feats_dict in feats_list]
+
+    requests = [(await read_upload(file), vector) for file, vector in zip(files, base_vectors)]
+
+    try:
+        results = await run_recommendation_batch(requests)
     except Exception as e:
-        print(f"Recommendation Error: {e}")
+        ERRORS.inc(stage="recommend")
+        logger.error("recommendation_failed", extra={"fields": {"error": str(e)}})
         raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "status": "success",
+        "results": [
+            {"status": "error", "detail": str(result)} if isinstance(result, Exception) else result
+            for result in results
+        ]
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Stage latency histograms and error / fallback / face-shape counters in Prometheus text format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def classification_cache_stats():
+    if vision_pool.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **vision_pool.cache.stats()}
+
+# --- FEEDBACK: queued and group-committed by a single writer thread ---
+feedback_writer = FeedbackWriter(
+    batch_size=config.FEEDBACK_BATCH_SIZE,
+    flush_interval_ms=config.FEEDBACK_FLUSH_MS,
+    max_queue=config.FEEDBACK_QUEUE_SIZE
+)
+
 @app.post("/feedback")
 async def post_feedback(request: FeedbackRequest):
-    save_user_feedback(
+    row = feedback_row(
         glass_id=request.glass_id,
         shape_id=request.detected_face_shape,
         features=request.features,
         liked=request.liked
     )
-    return {"status": "success"}
\ No newline at end of file
+    try:
+        await feedback_writer.enqueue(row, timeout=config.FEEDBACK_ENQUEUE_TIMEOUT)
+    except FeedbackQueueFull:
+        ERRORS.inc(stage="feedback_queue_full")
+        raise HTTPException(status_code=503, detail="Feedback queue is full, retry shortly.", headers={"Retry-After": "1"})
+    return {"status": "success"}
+
+def body_too_large():
+    return HTTPException(status_code=413, detail=f"Feedback batches are limited to {config.FEEDBACK_BATCH_MAX_BYTES} bytes.")
+
+async def limited_stream(request: Request, limit: int):
+    """
+    Request body chunks, answering 413 as soon as more than `limit` bytes are declared
+    (Content-Length) or received, so an oversized upload is never buffered or parsed.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise body_too_large()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > limit:
+            raise body_too_large()
+        yield chunk
+
+async def read_feedback_events(request: Request):
+    """
+    Yields (index, raw event or Exception) from either a JSON array body or an
+    NDJSON stream (Content-Type: application/x-ndjson), parsed line by line as it arrives.
+    Both are capped at FEEDBACK_BATCH_MAX_BYTES.
+    """
+    body = limited_stream(request, config.FEEDBACK_BATCH_MAX_BYTES)
+    if "ndjson" in request.headers.get("content-type", ""):
+        index = 0
+        pending = b""
+        async for chunk in body:
+            pending += chunk
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    try:
+                        yield index, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield index, e
+                    index += 1
+        if pending.strip():
+            try:
+                yield index, json.loads(pending)
+            except json.JSONDecodeError as e:
+                yield index, e
+        return
+
+    try:
+        events = json.loads(b"".join([chunk async for chunk in body]))
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON.")
+    if not isinstance(events, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array of feedback events.")
+    for index, event in enumerate(events):
+        yield index, event
+
+@app.post("/feedback/batch")
+async def post_feedback_batch(request: Request):
+    """
+    Bulk ingest for clients that buffer likes/dislikes offline. Every event is
+    validated as a FeedbackRequest; valid rows go in with one executemany
+    transaction and invalid ones are reported by index instead of failing the batch.
+    """
+    rows, errors = [], []
+    async for index, event in read_feedback_events(request):
+        if index >= config.FEEDBACK_BATCH_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {config.FEEDBACK_BATCH_MAX_ROWS} events per batch.")
+        if isinstance(event, Exception):
+            errors.append({"index": index, "error": f"Invalid JSON: {event}"})
+            continue
+        try:
+            if not isinstance(event, dict):
+                raise ValueError("event must be a JSON object")
+            feedback = FeedbackRequest(**event)
+            if len(feedback.features) < 3:
+                raise ValueError("features must contain cheek_jaw, face_hw and midface ratios")
+        except (ValidationError, ValueError) as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        rows.append(feedback_row(
+            glass_id=feedback.glass_id,
+            shape_id=feedback.detected_face_shape,
+            features=feedback.features,
+            liked=feedback.liked
+        ))
+
+    if errors:
+        ERRORS.inc(len(errors), stage="feedback_validation")
+    if rows:
+        await asyncio.to_thread(save_feedback_batch, rows)
+
+    return {
+        "status": "success" if not errors else "partial",
+        "inserted": len(rows),
+        "errors": errors
+    }
+
+# Last, so the heap freeze also covers every object created above
+if config.PRELOAD_MODELS:
+    preload_shared_models()
@@ -0,0 +1,151 @@
+# server/models/backends.py
+import hashlib
+import json
+import os
+import time
+import torch
+from models.model import HybridNeuMF, infer_hparams
+from services.logs import get_logger
+
+logger = get_logger("registry.backends")
+
+TORCHSCRIPT_FILE = "spectacular_hybrid.ts"
+ONNX_FILE = "spectacular_hybrid.onnx"
+# Key of the hyperparameter JSON inside the TorchScript extra files / ONNX metadata
+HPARAMS_KEY = "hparams.json"
+
+def checkpoint_fingerprint(path):
+    """Short content hash of a .pth checkpoint; exported scorers are tied to it."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+class EagerBackend:
+    """Plain PyTorch HybridNeuMFScorer built from the .pth checkpoint."""
+    name = "eager"
+
+    def __init__(self, checkpoint_path, catalog):
+        state_dict = torch.load(checkpoint_path, map_location=torch.device('cpu'))
+        hparams = infer_hparams(state_dict)
+
+        model = HybridNeuMF(**hparams)
+        model.load_state_dict(state_dict)
+        model.eval()
+        self.scorer = model.build_scorer(catalog.item_feature_tensor)
+        self.hparams = {
+            **hparams,
+            "catalog_fingerprint": catalog.fingerprint,
+            "checkpoint_fingerprint": checkpoint_fingerprint(checkpoint_path)
+        }
+
+    supports_candidates = True
+
+    def __call__(self, face_shape_id, client_features):
+        with torch.no_grad():
+            return self.scorer(face_shape_id, client_features)
+
+    def score_candidates(self, face_shape_id, client_features, item_ids):
+        with torch.no_grad():
+            return self.scorer.score_candidates(face_shape_id, client_features, item_ids)
+
+class TorchScriptBackend:
+    """Frozen, inference-optimized TorchScript scorer written by scripts/export_recommender.py."""
+    name = "torchscript"
+
+    def __init__(self, path):
+        extra_files = {HPARAMS_KEY: ""}
+        self.module = torch.jit.load(path, map_location="cpu", _extra_files=extra_files)
+        self.hparams = json.loads(extra_files[HPARAMS_KEY])
+        # Artifacts exported before candidate re-ranking existed only have forward()
+        self.supports_candidates = hasattr(self.module, "score_candidates")
+
+    def __call__(self, face_shape_id, client_features):
+        with torch.no_grad():
+            return self.module(face_shape_id, client_features)
+
+    def score_candidates(self, face_shape_id, client_features, item_ids):
+        with torch.no_grad():
+            return self.module.score_candidates(face_shape_id, client_features, item_ids)
+
+class OnnxBackend:
+    """ONNX scorer executed by onnxruntime on the CPU (optional dependency)."""
+    name = "onnx"
+    # Only forward() is exported, so two-stage retrieval falls back to exhaustive scoring
+    supports_candidates = False
+
+    def __init__(self, path):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.hparams = json.loads(self.session.get_modelmeta().custom_metadata_map[HPARAMS_KEY])
+
+    def __call__(self, face_shape_id, client_features):
+        scores = self.session.run(None, {
+            "face_shape_id": face_shape_id.numpy(),
+            "client_features": client_features.numpy()
+        })[0]
+        return torch.from_numpy(scores)
+
+def _backend_num_items(backend):
+    return backend.hparams["num_items"]
+
+def _time_backend(backend, iterations=20):
+    """Median latency of a single-request call, used to rank the available backends."""
+    face_shape_id = torch.zeros(1, dtype=torch.long)
+    client_features = torch.zeros(1, _backend_num_items(backend), backend.hparams["num_client_features"])
+    for _ in range(3):
+        backend(face_shape_id, client_features)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        backend(face_shape_id, client_features)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+def load_recommender(checkpoint_path, catalog, artifact_dir, backend="auto"):
+    """
+    Returns a callable scorer(face_shape_id (B,), client_features (B, N, C)) -> (B, N).
+
+    backend="auto" loads every exported artifact that matches the current catalog,
+    times them against eager mode and keeps the fastest. Naming a backend forces it,
+    falling back to eager if its artifact is missing or stale.
+    """
+    loaders = {
+        "onnx": lambda: OnnxBackend(os.path.join(artifact_dir, ONNX_FILE)),
+        "torchscript": lambda: TorchScriptBackend(os.path.join(artifact_dir, TORCHSCRIPT_FILE)),
+    }
+    wanted = list(loaders) if backend == "auto" else [b for b in loaders if b == backend]
+
+    expected_checkpoint = checkpoint_fingerprint(checkpoint_path) if os.path.exists(checkpoint_path) else None
+
+    candidates = []
+    for name in wanted:
+        try:
+            candidate = loaders[name]()
+        except Exception as e:
+            logger.warning("backend_unavailable", extra={"fields": {"backend": name, "error": str(e)}})
+            continue
+        if candidate.hparams.get("catalog_fingerprint") != catalog.fingerprint:
+            logger.warning("backend_stale", extra={"fields": {"backend": name, "reason": "catalog_fingerprint"}})
+            continue
+        if expected_checkpoint and candidate.hparams.get("checkpoint_fingerprint") != expected_checkpoint:
+            logger.warning("backend_stale", extra={"fields": {"backend": name, "reason": "checkpoint_fingerprint"}})
+            continue
+        candidates.append(candidate)
+
+    if backend in ("auto", "eager") or not candidates:
+        candidates.append(EagerBackend(checkpoint_path, catalog))
+
+    if len(candidates) == 1:
+        chosen = candidates[0]
+    else:
+        timings = {c.name: _time_backend(c) for c in candidates}
+        chosen = min(candidates, key=lambda c: timings[c.name])
+        logger.info("backend_timings", extra={"fields": {f"{name}_ms": round(t * 1000, 3) for name, t in timings.items()}})
+
+    chosen.num_items = _backend_num_items(chosen)
+    logger.info("backend_selected", extra={"fields": {"backend": chosen.name, "num_items": chosen.num_items}})
+    return chosen
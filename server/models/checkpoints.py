@@ -0,0 +1,54 @@
+# server/models/checkpoints.py
+import json
+import os
+import re
+import torch
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASE_CHECKPOINT = os.path.join(SERVER_DIR, 'spectacular_hybrid.pth')
+CHECKPOINT_DIR = os.path.join(SERVER_DIR, 'checkpoints')
+TRAIN_STATE_PATH = os.path.join(CHECKPOINT_DIR, 'train_state.json')
+
+_VERSION_PATTERN = re.compile(r"^spectacular_hybrid_v(\d+)\.pth$")
+
+def list_versions(checkpoint_dir=CHECKPOINT_DIR):
+    """Returns [(version, path)] of versioned checkpoints, oldest first."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    versions = []
+    for name in os.listdir(checkpoint_dir):
+        match = _VERSION_PATTERN.match(name)
+        if match:
+            versions.append((int(match.group(1)), os.path.join(checkpoint_dir, name)))
+    return sorted(versions)
+
+def latest_checkpoint(checkpoint_dir=CHECKPOINT_DIR):
+    """(version, path) of the newest versioned checkpoint, or (0, base checkpoint) if none exist."""
+    versions = list_versions(checkpoint_dir)
+    return versions[-1] if versions else (0, BASE_CHECKPOINT)
+
+def save_versioned_checkpoint(state_dict, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Writes the next spectacular_hybrid_v{N}.pth. The file is written under a temporary
+    name and renamed, so anything watching the directory never sees a partial checkpoint.
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    version = latest_checkpoint(checkpoint_dir)[0] + 1
+    path = os.path.join(checkpoint_dir, f"spectacular_hybrid_v{version}.pth")
+    tmp_path = path + ".tmp"
+    torch.save(state_dict, tmp_path)
+    os.replace(tmp_path, path)
+    return version, path
+
+def load_train_state(path=TRAIN_STATE_PATH):
+    if not os.path.exists(path):
+        return {"feedback_high_water_mark": 0}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_train_state(state, path=TRAIN_STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, path)
@@ -1,8 +1,60 @@
+import copy
 import torch
 import torch.nn as nn
 import pytorch_lightning as pl
 import torch.optim as optim
 
+# Above this the per-shape first-layer table (shapes x items x hidden float32) isn't
+# materialized and the shape and item pre-activations are added per request instead
+PER_SHAPE_TABLE_MAX_BYTES = 256 * 1024 * 1024
+
+def fold_linear_bn(linear, bn):
+    """Returns a single Linear equivalent to bn(linear(x)) using the BatchNorm running statistics."""
+    scale = bn.weight / torch.sqrt(bn.running_var + bn.eps)
+    bias = linear.bias if linear.bias is not None else torch.zeros_like(bn.running_mean)
+
+    fused = nn.Linear(linear.in_features, linear.out_features)
+    fused.weight.data.copy_(linear.weight * scale.unsqueeze(1))
+    fused.bias.data.copy_((bias - bn.running_mean) * scale + bn.bias)
+    return fused
+
+def fold_sequential(block):
+    """
+    Copies an nn.Sequential for eval-mode inference: every Linear -> BatchNorm1d
+    pair is folded into one Linear and Dropout layers are dropped.
+    """
+    layers = list(block)
+    folded = []
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        if isinstance(layer, nn.Linear) and i + 1 < len(layers) and isinstance(layers[i + 1], nn.BatchNorm1d):
+            folded.append(fold_linear_bn(layer, layers[i + 1]))
+            i += 2
+            continue
+        if not isinstance(layer, nn.Dropout):
+            folded.append(copy.deepcopy(layer))
+        i += 1
+    return nn.Sequential(*folded)
+
+def infer_hparams(state_dict):
+    """Recovers the constructor arguments of a HybridNeuMF from its saved state_dict."""
+    return {
+        "num_face_shapes": state_dict["embed_shape_GMF.weight"].shape[0],
+        "num_items": state_dict["embed_item_GMF.weight"].shape[0],
+        "num_client_features": state_dict["client_processor.0.weight"].shape[1],
+        "num_item_features": state_dict["item_processor.0.weight"].shape[1],
+        "factor_num": state_dict["embed_item_GMF.weight"].shape[1],
+    }
+
+def load_hybrid_neumf(path):
+    """Loads a checkpoint (plain state_dict) into an eval-mode HybridNeuMF sized from the weights."""
+    state_dict = torch.load(path, map_location=torch.device('cpu'))
+    model = HybridNeuMF(**infer_hparams(state_dict))
+    model.load_state_dict(state_dict)
+    model.eval()
+    return model
+
 class HybridNeuMF(pl.LightningModule):
     def __init__(self, num_face_shapes, num_items, num_client_features=4, num_item_features=5, factor_num=32, lr=0.005, epochs=30):
         super().__init__()
@@ -86,4 +138,103 @@ class HybridNeuMF(pl.LightningModule):
         optimizer = optim.AdamW(self.parameters(), lr=self.lr, weight_decay=1e-4)
         # FIXED: T_max now accurately reflects your max_epochs to decay properly
         scheduler = optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=self.epochs)
-        return [optimizer], [scheduler]
\ No newline at end of file
+        return [optimizer], [scheduler]
+
+    def build_scorer(self, item_features):
+        """
+        Returns an inference-only HybridNeuMFScorer with the item tower precomputed
+        for the given catalog. Call again whenever the catalog or the weights change.
+        """
+        return HybridNeuMFScorer(self, item_features)
+
+class HybridNeuMFScorer(nn.Module):
+    """
+    Frozen serving path for a trained HybridNeuMF.
+
+    BatchNorm is folded into the preceding Linear layers and everything that does not
+    depend on the user is computed once here:
+      - gmf_table (S, M): the GMF half of predict_layer for every (shape, item) pair,
+        i.e. (embed_shape_GMF[s] * embed_item_GMF[m]) . w_gmf.
+      - The first mlp Linear over [s_mlp, i_mlp, c_feat, i_feat] splits into one
+        matmul per block. The shape, item and item-feature blocks (plus the bias) are
+        summed into per-shape pre-activations: pair_pre (S, M, H) when it fits in
+        max_table_bytes, otherwise item_pre (M, H) + shape_pre (S, H) added per request.
+    A request then runs the client branch, one client-block matmul per item, the
+    remaining mlp layers and a dot product with the MLP half of predict_layer.
+    """
+    def __init__(self, model, item_features, max_table_bytes=PER_SHAPE_TABLE_MAX_BYTES):
+        super().__init__()
+        with torch.no_grad():
+            mlp = fold_sequential(model.mlp)
+            first = mlp[0]
+            if not isinstance(first, nn.Linear) or not isinstance(mlp[1], nn.ReLU):
+                raise ValueError("mlp must start with Linear -> (BatchNorm) -> ReLU")
+            factor = model.embed_shape_MLP.embedding_dim
+            w_shape, w_item, w_client, w_feat = first.weight.split(factor, dim=1)
+
+            self.client_processor = fold_sequential(model.client_processor)
+            self.client_block = nn.Linear(factor, first.out_features, bias=False)
+            self.client_block.weight.copy_(w_client)
+            self.mlp_tail = mlp[2:]
+
+            # predict_layer over [out_gmf, out_mlp] is w_gmf . out_gmf + w_mlp . out_mlp + b
+            w_gmf, w_mlp = model.predict_layer.weight[0].split([factor, model.predict_layer.in_features - factor])
+            self.mlp_predict = nn.Linear(w_mlp.shape[0], 1)
+            self.mlp_predict.weight.copy_(w_mlp.unsqueeze(0))
+            self.mlp_predict.bias.copy_(model.predict_layer.bias)
+
+            shape_gmf = model.embed_shape_GMF.weight
+            item_gmf = model.embed_item_GMF.weight
+            self.register_buffer("gmf_table", ((shape_gmf * w_gmf) @ item_gmf.T).contiguous())
+
+            item_processor = fold_sequential(model.item_processor)
+            item_feat = item_processor(item_features.to(torch.float32))
+            item_pre = model.embed_item_MLP.weight @ w_item.T + item_feat @ w_feat.T + first.bias
+            shape_pre = model.embed_shape_MLP.weight @ w_shape.T
+
+            num_shapes, num_items = self.gmf_table.shape
+            self.per_shape_table = num_shapes * num_items * first.out_features * 4 <= max_table_bytes
+            if self.per_shape_table:
+                pair_pre = shape_pre.unsqueeze(1) + item_pre.unsqueeze(0)
+            else:
+                pair_pre = torch.empty(0, 0, first.out_features)
+            self.register_buffer("pair_pre", pair_pre.contiguous())
+            self.register_buffer("item_pre", item_pre.contiguous())
+            self.register_buffer("shape_pre", shape_pre.contiguous())
+
+        self.num_items = num_items
+        self.requires_grad_(False)
+        self.eval()
+
+    def forward(self, face_shape_id, client_features):
+        """
+        face_shape_id: (B,) long tensor, one face shape per request.
+        client_features: (B, num_items, num_client_features) engineered client features.
+        Returns a (B, num_items) score matrix.
+        """
+        if self.per_shape_table:
+            base = self.pair_pre[face_shape_id]
+        else:
+            base = self.item_pre.unsqueeze(0) + self.shape_pre[face_shape_id].unsqueeze(1)
+        return self._head(base, self.gmf_table[face_shape_id], client_features)
+
+    @torch.jit.export
+    def score_candidates(self, face_shape_id, client_features, item_ids):
+        """
+        Re-ranking path: scores only the given items.
+        item_ids: (B, N) long tensor; client_features: (B, N, num_client_features) for those items.
+        Returns a (B, N) score matrix.
+        """
+        rows = face_shape_id.unsqueeze(1)
+        if self.per_shape_table:
+            base = self.pair_pre[rows, item_ids]
+        else:
+            base = self.item_pre[item_ids] + self.shape_pre[face_shape_id].unsqueeze(1)
+        return self._head(base, self.gmf_table[rows, item_ids], client_features)
+
+    def _head(self, base, gmf, client_features):
+        # base: (B, N, H) shape+item first-layer pre-activations; gmf: (B, N) GMF scores
+        c_feat = self.client_processor(client_features)
+        hidden = torch.relu(base + self.client_block(c_feat))
+        out_mlp = self.mlp_tail(hidden)
+        return gmf + self.mlp_predict(out_mlp).squeeze(-1)
@@ -0,0 +1,135 @@
+# server/models/registry.py
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+import torch
+from database.catalog import GlassesCatalog, binary_path_for, META_FILE
+from models.backends import load_recommender
+from models.retrieval import CandidateIndex
+from models.checkpoints import latest_checkpoint, CHECKPOINT_DIR
+from services.logs import get_logger
+
+logger = get_logger("registry")
+
+@dataclass(frozen=True)
+class ModelVersion:
+    """One immutable (checkpoint, catalog, scorer) triple. Requests hold on to it for their whole lifetime."""
+    version: str
+    checkpoint_path: str
+    catalog: GlassesCatalog
+    scorer: object
+    # Two-stage retrieval index, or None when every item is scored exhaustively
+    retriever: CandidateIndex = None
+
+def warm_up_scorer(scorer, catalog):
+    shape_tensor = torch.zeros(1, dtype=torch.long)
+    client_feat_tensor = torch.from_numpy(catalog.client_features([[1.0, 1.0, 1.0]]))
+    scorer(shape_tensor, client_feat_tensor)
+
+class ModelRegistry:
+    """
+    Serves the newest versioned checkpoint (models/checkpoints.py) together with the
+    current catalog file. A background task polls both; when either changes, the new
+    pair is loaded and warmed off the event loop and then swapped in with a single
+    reference assignment. Callers read `current` once per request, so anything already
+    in flight finishes on the version it started with.
+    """
+    def __init__(self, catalog_path, artifact_dir, backend="auto", checkpoint_dir=CHECKPOINT_DIR, poll_seconds=10.0,
+                 retrieval_candidates=0, width_tolerance=0.25):
+        self.catalog_path = catalog_path
+        self.artifact_dir = artifact_dir
+        self.backend = backend
+        self.retrieval_candidates = retrieval_candidates
+        self.width_tolerance = width_tolerance
+        self.checkpoint_dir = checkpoint_dir
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self._source = None
+        self._task = None
+        self._reload_lock = threading.Lock()
+
+    def _probe(self):
+        """(checkpoint version, checkpoint path, catalog mtimes): changes whenever a reload is due."""
+        version, path = latest_checkpoint(self.checkpoint_dir)
+        catalog_mtimes = []
+        # The JSON file and its binary copy (whichever GlassesCatalog.load would pick)
+        for catalog_file in (self.catalog_path, os.path.join(binary_path_for(self.catalog_path), META_FILE)):
+            try:
+                catalog_mtimes.append(os.stat(catalog_file).st_mtime_ns)
+            except FileNotFoundError:
+                catalog_mtimes.append(None)
+        return version, path, tuple(catalog_mtimes)
+
+    def _load(self, source):
+        version, path, _ = source
+        try:
+            catalog = GlassesCatalog.load(self.catalog_path)
+        except FileNotFoundError:
+            logger.error("catalog_missing", extra={"fields": {"path": self.catalog_path}})
+            catalog = GlassesCatalog.empty()
+
+        # Picks the fastest of ONNX / TorchScript / eager; item-side activations are cached per catalog.
+        scorer = load_recommender(path, catalog, self.artifact_dir, backend=self.backend)
+        if scorer.num_items != len(catalog):
+            raise ValueError(f"model has {scorer.num_items} items but the catalog has {len(catalog)}")
+        warm_up_scorer(scorer, catalog)
+        return ModelVersion(
+            version=f"v{version}+{catalog.fingerprint[:8]}",
+            checkpoint_path=path,
+            catalog=catalog,
+            scorer=scorer,
+            retriever=self._build_retriever(path, catalog, scorer)
+        )
+
+    def _build_retriever(self, path, catalog, scorer):
+        """Candidate index when the catalog is large enough for two-stage scoring to pay off."""
+        n = self.retrieval_candidates
+        if n <= 0 or len(catalog) <= 2 * n:
+            return None
+        if not getattr(scorer, "supports_candidates", False):
+            logger.warning("retrieval_unsupported", extra={"fields": {"backend": scorer.name}})
+            return None
+        state_dict = torch.load(path, map_location=torch.device('cpu'))
+        return CandidateIndex.from_state_dict(state_dict, catalog, n, self.width_tolerance)
+
+    def reload(self, force=False):
+        """Loads and swaps in the latest checkpoint/catalog if they changed. Returns True on a swap."""
+        with self._reload_lock:
+            source = self._probe()
+            if source == self._source and not force:
+                return False
+            try:
+                candidate = self._load(source)
+            except Exception as e:
+                # Keep serving the previous version; the same source is not retried until it changes
+                logger.error("model_load_failed", extra={"fields": {"checkpoint": source[1], "error": str(e)}})
+                self._source = source
+                return False
+            self._source = source
+            self.current = candidate
+            logger.info("model_swapped", extra={"fields": {
+                "version": candidate.version, "backend": candidate.scorer.name, "checkpoint": candidate.checkpoint_path
+            }})
+            return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.exception("registry_poll_failed", extra={"fields": {"error": str(e)}})
+
+    def start_watching(self):
+        if self.poll_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop_watching(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,50 @@
+# server/models/retrieval.py
+import torch
+
+def gmf_table(state_dict):
+    """
+    (num_face_shapes, num_items) GMF contribution to the final score:
+    (embed_shape_GMF * embed_item_GMF) weighted by the GMF half of predict_layer.
+    Depends only on (shape, item), so it is computed once per checkpoint.
+    """
+    shape_gmf = state_dict["embed_shape_GMF.weight"].float()
+    item_gmf = state_dict["embed_item_GMF.weight"].float()
+    gmf_weight = state_dict["predict_layer.weight"][0, :shape_gmf.shape[1]].float()
+    return (shape_gmf * gmf_weight) @ item_gmf.T
+
+class CandidateIndex:
+    """
+    Candidate generation for large catalogs. Items are pre-sorted per face shape by
+    their GMF score; a request walks its shape's list and keeps the first N items whose
+    width fits the face (|face_hw - width| <= width_tolerance), topping up with the best
+    misfits if fewer than N fit. Only the candidates go through the full MLP head.
+    """
+    def __init__(self, table, widths, num_candidates=512, width_tolerance=0.25):
+        self.num_items = table.shape[1]
+        self.num_candidates = num_candidates
+        self.width_tolerance = width_tolerance
+        # int32 keeps the per-shape orderings at 4 bytes per (shape, item)
+        self.order = torch.argsort(table, dim=1, descending=True).to(torch.int32)
+        self.ordered_widths = torch.as_tensor(widths, dtype=torch.float32)[self.order.long()]
+        self._positions = torch.arange(self.num_items, dtype=torch.int64)
+
+    @classmethod
+    def from_state_dict(cls, state_dict, catalog, num_candidates=512, width_tolerance=0.25):
+        return cls(gmf_table(state_dict), catalog.widths, num_candidates, width_tolerance)
+
+    def candidates(self, face_shape_id, face_hw, n=None, largest=True):
+        """
+        face_shape_id: (B,) long; face_hw: (B,) float. Returns (B, n) long item ids,
+        n defaulting to num_candidates. largest=False retrieves from the bottom of the
+        GMF order instead, preferring items that do not fit, for the lowest-match list.
+        """
+        n = min(n or self.num_candidates, self.num_items)
+        ordered_widths = self.ordered_widths[face_shape_id]
+        fits = (ordered_widths - face_hw.unsqueeze(1)).abs() <= self.width_tolerance
+
+        positions = self._positions if largest else self._positions.flip(0)
+        demoted = fits.logical_not() if largest else fits
+        # Walk order: fitting items by GMF rank first, everything else after them
+        key = positions.unsqueeze(0) + demoted.to(torch.int64) * self.num_items
+        picks = torch.topk(key, n, dim=1, largest=False).indices
+        return self.order[face_shape_id].gather(1, picks.to(torch.int64)).long()
@@ -0,0 +1,239 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+# Ensure models and services can be imported (also inside spawned case processes)
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(SERVER_DIR)
+
+DEFAULT_CATALOG_SIZES = [45, 1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_BATCH_SIZES = [1, 8, 32]
+DEFAULT_BACKENDS = ["eager", "torchscript", "onnx"]
+DEFAULT_RESOLUTIONS = ["640x480", "1280x960", "3024x4032"]
+# (requests x items) pairs above this are skipped; activations grow linearly with it
+MAX_PAIRS_PER_CALL = 8_000_000
+
+def percentile(sorted_values, q):
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def latency_summary(timings):
+    timings = sorted(timings)
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p95_ms": round(percentile(timings, 95) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 4)
+    }
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; each case runs in a fresh process, so this is the case's own peak
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def synthetic_catalog(num_items, seed=0):
+    import numpy as np
+    from database.catalog import GlassesCatalog, ITEM_FEATURE_KEYS
+
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(0.0, 1.0, (num_items, len(ITEM_FEATURE_KEYS))).astype(np.float32)
+    shape_ids = rng.integers(0, 5, num_items)
+    names = [f"Model {i}" for i in range(num_items)]
+    return GlassesCatalog(features, shape_ids, names, [""] * num_items)
+
+def build_backend(name, num_items, workdir):
+    """Randomly initialised scorer of the requested kind for a synthetic catalog of num_items."""
+    import torch
+    from models.model import HybridNeuMF
+    from models.backends import EagerBackend, TorchScriptBackend, OnnxBackend
+    from scripts.export_recommender import export_torchscript, export_onnx
+
+    catalog = synthetic_catalog(num_items)
+    checkpoint = os.path.join(workdir, "model.pth")
+    torch.manual_seed(0)
+    torch.save(HybridNeuMF(num_face_shapes=5, num_items=num_items).state_dict(), checkpoint)
+
+    eager = EagerBackend(checkpoint, catalog)
+    if name == "eager":
+        return eager, catalog
+    if name == "torchscript":
+        path = os.path.join(workdir, "model.ts")
+        export_torchscript(eager.scorer, eager.hparams, path)
+        return TorchScriptBackend(path), catalog
+    if name == "onnx":
+        path = os.path.join(workdir, "model.onnx")
+        export_onnx(eager.scorer, eager.hparams, path)
+        return OnnxBackend(path), catalog
+    raise ValueError(f"Unknown backend: {name}")
+
+def run_recommender_case(case):
+    """One (catalog size, backend, threads, batch) measurement. Runs in its own process."""
+    import torch
+
+    torch.set_num_threads(case["threads"])
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            backend, catalog = build_backend(case["backend"], case["catalog_size"], workdir)
+        except ImportError as e:
+            return {**case, "skipped": f"{case['backend']} unavailable: {e}"}
+
+        batch = case["batch_size"]
+        shapes = torch.randint(0, 5, (batch,))
+        base_vectors = torch.empty(batch, 3).uniform_(0.7, 1.3).numpy()
+        client = torch.from_numpy(catalog.client_features(base_vectors))
+
+        for _ in range(case["warmup"]):
+            backend(shapes, client)
+
+        timings = []
+        deadline = time.perf_counter() + case["max_seconds"]
+        for _ in range(case["repeats"]):
+            start = time.perf_counter()
+            backend(shapes, client)
+            timings.append(time.perf_counter() - start)
+            if time.perf_counter() > deadline:
+                break
+
+    summary = latency_summary(timings)
+    seconds_per_call = summary["mean_ms"] / 1000
+    return {
+        **case,
+        "calls": len(timings),
+        **summary,
+        "requests_per_second": round(batch / seconds_per_call, 2),
+        "items_scored_per_second": round(batch * case["catalog_size"] / seconds_per_call, 1),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_classifier_case(case):
+    """Per-stage timings of the vision pipeline for one input resolution. Runs in its own process."""
+    import random
+    import torch
+    from scripts.load_test import make_face_image, parse_resolution
+
+    torch.set_num_threads(case["threads"])
+    try:
+        from services.classifier import FaceShapeClassifier
+        classifier = FaceShapeClassifier()
+        if classifier.model is None:
+            raise RuntimeError("ViT model could not be loaded")
+    except Exception as e:
+        return {**case, "skipped": f"classifier unavailable: {e}"}
+
+    width, height = parse_resolution(case["resolution"])
+    rng = random.Random(0)
+    images = [make_face_image(width, height, rng) for _ in range(4)]
+    for image in images[:case["warmup"]]:
+        classifier.analyze_batch([image])
+
+    stage_timings = {}
+    totals = []
+    for i in range(case["repeats"]):
+        timings = {}
+        start = time.perf_counter()
+        classifier.analyze_batch([images[i % len(images)]], timings)
+        totals.append(time.perf_counter() - start)
+        for stage, seconds in timings.items():
+            stage_timings.setdefault(stage, []).append(seconds)
+
+    total = latency_summary(totals)
+    return {
+        **case,
+        **total,
+        "images_per_second": round(1000 / total["mean_ms"], 2),
+        "stages": {stage: latency_summary(values) for stage, values in stage_timings.items()},
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def run_isolated(fn, case):
+    """Runs a case in a fresh spawned process so peak RSS and thread settings don't leak between cases."""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(fn, (case,))
+
+def print_recommender_row(row):
+    if "skipped" in row:
+        print(f"  {row['backend']:<11} items={row['catalog_size']:<9} batch={row['batch_size']:<4} "
+              f"threads={row['threads']:<3} skipped: {row['skipped']}")
+        return
+    print(f"  {row['backend']:<11} items={row['catalog_size']:<9} batch={row['batch_size']:<4} threads={row['threads']:<3} "
+          f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms req/s={row['requests_per_second']:<10} "
+          f"rss={row['peak_rss_mb']}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the HybridNeuMF scorer and the face-shape classifier.")
+    parser.add_argument("--suite", choices=["all", "recommender", "classifier"], default="all")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=DEFAULT_CATALOG_SIZES)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="Torch thread counts (default: 1 and all cores)")
+    parser.add_argument("--backends", nargs="+", default=DEFAULT_BACKENDS, choices=DEFAULT_BACKENDS)
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--max-seconds", type=float, default=20.0, help="Time cap for the timed loop of one case")
+    parser.add_argument("--max-pairs", type=int, default=MAX_PAIRS_PER_CALL)
+    parser.add_argument("--output", default=None, help="JSON results path (default: benchmark_<timestamp>.json)")
+    args = parser.parse_args()
+
+    # Case processes inherit this: the classifier must load from the local snapshot
+    os.environ.setdefault("VIT_OFFLINE", "1")
+    cpus = os.cpu_count() or 1
+    thread_counts = args.threads or sorted({1, cpus})
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"cpus": cpus, "platform": platform.platform(), "python": platform.python_version()},
+        "recommender": [],
+        "classifier": []
+    }
+
+    if args.suite in ("all", "recommender"):
+        print("\n" + "="*70)
+        print(" HybridNeuMF SCORER")
+        print("="*70)
+        for catalog_size in args.catalog_sizes:
+            for backend in args.backends:
+                for threads in thread_counts:
+                    for batch_size in args.batch_sizes:
+                        case = {
+                            "backend": backend, "catalog_size": catalog_size, "batch_size": batch_size,
+                            "threads": threads, "repeats": args.repeats, "warmup": args.warmup,
+                            "max_seconds": args.max_seconds
+                        }
+                        if batch_size * catalog_size > args.max_pairs:
+                            row = {**case, "skipped": f"{batch_size * catalog_size} pairs exceeds --max-pairs"}
+                        else:
+                            row = run_isolated(run_recommender_case, case)
+                        report["recommender"].append(row)
+                        print_recommender_row(row)
+
+    if args.suite in ("all", "classifier"):
+        print("\n" + "="*70)
+        print(" FACE-SHAPE CLASSIFIER (per stage)")
+        print("="*70)
+        for resolution in args.resolutions:
+            for threads in thread_counts:
+                case = {
+                    "resolution": resolution, "threads": threads,
+                    "repeats": max(1, args.repeats // 5), "warmup": args.warmup
+                }
+                row = run_isolated(run_classifier_case, case)
+                report["classifier"].append(row)
+                if "skipped" in row:
+                    print(f"  {resolution:<10} threads={threads:<3} skipped: {row['skipped']}")
+                    continue
+                stages = " ".join(f"{stage}={values['p50_ms']:.1f}ms" for stage, values in row["stages"].items())
+                print(f"  {resolution:<10} threads={threads:<3} p50={row['p50_ms']:.1f}ms p99={row['p99_ms']:.1f}ms "
+                      f"[{stages}] rss={row['peak_rss_mb']}MB")
+
+    output = args.output or f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"\n✅ Results saved to {output}")
+
+if __name__ == "__main__":
+    main()
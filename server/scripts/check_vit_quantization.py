@@ -0,0 +1,90 @@
+import argparse
+import io
+import os
+import sys
+import time
+import torch
+
+# Ensure services can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.classifier import FaceShapeClassifier
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+def model_size_mb(model):
+    """Serialized weight size; quantized packed Linear weights are counted correctly this way."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 1e6
+
+def load_images(folder):
+    paths = sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+def classify_all(classifier, images, batch_size):
+    """Returns (labels, seconds per image) over the whole folder."""
+    labels = []
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        labels.extend(classifier.predict_batch([data for _, data in images[i:i + batch_size]]))
+    elapsed = time.perf_counter() - start
+    return labels, elapsed / max(1, len(images))
+
+def main():
+    parser = argparse.ArgumentParser(description="Label agreement of a reduced-precision ViT against fp32.")
+    parser.add_argument("folder", help="Folder of face photos")
+    parser.add_argument("--precision", default="int8", choices=["int8", "bf16"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    images = load_images(args.folder)
+    if not images:
+        print(f"❌ No images found in {args.folder}")
+        return
+
+    reference = FaceShapeClassifier(precision="fp32")
+    candidate = FaceShapeClassifier(precision=args.precision)
+    if candidate.precision != args.precision:
+        print(f"❌ {args.precision} is not available on this machine.")
+        return
+
+    # Warm both models so one-off initialisation isn't counted as latency
+    reference.predict_batch([images[0][1]])
+    candidate.predict_batch([images[0][1]])
+
+    ref_labels, ref_latency = classify_all(reference, images, args.batch_size)
+    cand_labels, cand_latency = classify_all(candidate, images, args.batch_size)
+
+    compared = 0
+    agreed = 0
+    mismatches = []
+    for (name, _), ref, cand in zip(images, ref_labels, cand_labels):
+        if isinstance(ref, Exception) or isinstance(cand, Exception):
+            continue
+        compared += 1
+        if ref == cand:
+            agreed += 1
+        else:
+            mismatches.append((name, ref, cand))
+
+    print("\n" + "="*50)
+    print(f" ViT {args.precision.upper()} vs FP32 AGREEMENT")
+    print("="*50)
+    print(f"Images compared: {compared}/{len(images)}")
+    print(f"Label agreement: {agreed}/{compared} ({agreed / max(1, compared) * 100:.2f}%)")
+    print(f"Latency per image: fp32 {ref_latency * 1000:.1f} ms | {args.precision} {cand_latency * 1000:.1f} ms "
+          f"({ref_latency / max(cand_latency, 1e-9):.2f}x)")
+    print(f"Weight size: fp32 {model_size_mb(reference.model):.1f} MB | "
+          f"{args.precision} {model_size_mb(candidate.model):.1f} MB")
+    for name, ref, cand in mismatches:
+        print(f"  ❌ {name}: fp32={ref} {args.precision}={cand}")
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,62 @@
 import pandas as pd
+import numpy as np
 import json
+import os
+import sys
+
+# Ensure database can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database.catalog import GlassesCatalog, ITEM_FEATURE_KEYS, binary_path_for
+
+def column(df, name, default=0):
+    """A spreadsheet column, or a constant one when the sheet doesn't have it."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index)
+
+def build_columns(df):
+    """Every catalog field as a whole-column operation (no per-row Python)."""
+    index = pd.Series(df.index, index=df.index)
+    file_names = column(df, 'Model File Name', None)
+    material = column(df, 'Material ID').astype(float)
+    rim = column(df, 'Rim ID').astype(float)
+    return pd.DataFrame({
+        "file_name": file_names.where(file_names.notna(), "glass_" + index.astype(str) + ".glb").astype(str),
+        "name": column(df, 'Name', '').astype(str),
+        "shape_id": column(df, 'Shape ID').astype(int),
+        "material_id": material.astype(int),
+        "rim_id": rim.astype(int),
+        "width": column(df, 'Width (cm)').astype(float) / 20.0,
+        "height": column(df, 'Height (cm)').astype(float) / 10.0,
+        "bridge_pos": column(df, 'Bridge Pos').astype(float),
+        "normalized_material": material / 2.0,
+        "normalized_rim": rim / 2.0
+    })
 
 def convert_csv_to_json(csv_path, json_path):
     df = pd.read_excel(csv_path)
     df = df.fillna(0)
+    columns = build_columns(df)
 
-    glasses_db = {}
-    
-    for index, row in df.iterrows():
-        glasses_db[str(index)] = {
-            "file_name": str(row.get('Model File Name', f'glass_{index}.glb')),
-            "name": str(row.get('Name', '')),
-            "shape_id": int(row.get('Shape ID', 0)),
-            "material_id": int(row.get('Material ID', 0)),
-            "rim_id": int(row.get('Rim ID', 0)),
-            "width": float(row.get('Width (cm)', 0)) / 20.0,
-            "height": float(row.get('Height (cm)', 0)) / 10.0,
-            "bridge_pos": float(row.get('Bridge Pos', 0)),
-            "normalized_material": float(row.get('Material ID', 0)) / 2.0,
-            "normalized_rim": float(row.get('Rim ID', 0)) / 2.0
-        }
-
+    glasses_db = {str(i): record for i, record in enumerate(columns.to_dict("records"))}
     with open(json_path, 'w') as f:
         json.dump(glasses_db, f, indent=4)
 
+    # Columnar binary copy that the server, trainer and evaluator memory-map
+    catalog = GlassesCatalog(
+        columns[ITEM_FEATURE_KEYS].to_numpy(dtype=np.float32),
+        columns["shape_id"].to_numpy(dtype=np.int64),
+        columns["name"].tolist(),
+        columns["file_name"].tolist()
+    )
+    catalog.save_binary(binary_path_for(json_path))
+
+def convert_json_to_binary(json_path):
+    """Writes the binary copy for an existing glasses_database.json."""
+    GlassesCatalog.from_json(json_path).save_binary(binary_path_for(json_path))
+
 if __name__ == "__main__":
-    convert_csv_to_json('Glasses Features.xlsx', 'glasses_database.json')
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "--from-json":
+        convert_json_to_binary(sys.argv[2] if len(sys.argv) > 2 else 'glasses_database.json')
+    else:
+        convert_csv_to_json('Glasses Features.xlsx', 'glasses_database.json')
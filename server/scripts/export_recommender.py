@@ -0,0 +1,92 @@
+import torch
+import json
+import os
+import sys
+
+# Ensure models can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.backends import (
+    EagerBackend, TorchScriptBackend, OnnxBackend, TORCHSCRIPT_FILE, ONNX_FILE, HPARAMS_KEY
+)
+from database.catalog import GlassesCatalog
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+CHECKPOINT_PATH = os.path.join(SERVER_DIR, 'spectacular_hybrid.pth')
+DB_PATH = os.path.join(SERVER_DIR, 'database', 'glasses_database.json')
+ARTIFACT_DIR = os.path.join(SERVER_DIR, 'artifacts')
+
+def example_inputs(hparams, batch=2):
+    face_shape_id = torch.zeros(batch, dtype=torch.long)
+    client_features = torch.rand(batch, hparams["num_items"], hparams["num_client_features"])
+    return face_shape_id, client_features
+
+def export_torchscript(scorer, hparams, path):
+    """Scripts, freezes and optimizes the scorer; hyperparameters travel as an extra file."""
+    scripted = torch.jit.script(scorer)
+    # score_candidates is the re-ranking entry point for two-stage retrieval
+    frozen = torch.jit.optimize_for_inference(
+        torch.jit.freeze(scripted, preserved_attrs=["score_candidates"]),
+        other_methods=["score_candidates"]
+    )
+    torch.jit.save(frozen, path, _extra_files={HPARAMS_KEY: json.dumps(hparams)})
+    print(f"✅ TorchScript scorer saved to {path}")
+
+def export_onnx(scorer, hparams, path):
+    """Exports the scorer with a dynamic request axis; hyperparameters go in the model metadata."""
+    import onnx
+
+    torch.onnx.export(
+        scorer,
+        example_inputs(hparams),
+        path,
+        input_names=["face_shape_id", "client_features"],
+        output_names=["scores"],
+        dynamic_axes={
+            "face_shape_id": {0: "batch"},
+            "client_features": {0: "batch"},
+            "scores": {0: "batch"}
+        },
+        opset_version=17
+    )
+    exported = onnx.load(path)
+    entry = exported.metadata_props.add()
+    entry.key = HPARAMS_KEY
+    entry.value = json.dumps(hparams)
+    onnx.save(exported, path)
+    print(f"✅ ONNX scorer saved to {path}")
+
+def check_parity(reference, path, loader):
+    """Compares an exported artifact against the eager scorer on random inputs."""
+    backend = loader(path)
+    face_shape_id, client_features = example_inputs(reference.hparams, batch=4)
+    expected = reference(face_shape_id, client_features)
+    actual = backend(face_shape_id, client_features)
+    print(f"   max |eager - {backend.name}| = {(expected - actual).abs().max().item():.2e}")
+
+    if getattr(backend, "supports_candidates", False):
+        item_ids = torch.randint(0, reference.hparams["num_items"], (4, 8))
+        candidate_features = torch.rand(4, 8, reference.hparams["num_client_features"])
+        expected = reference.score_candidates(face_shape_id, candidate_features, item_ids)
+        actual = backend.score_candidates(face_shape_id, candidate_features, item_ids)
+        print(f"   max |eager - {backend.name}| (candidates) = {(expected - actual).abs().max().item():.2e}")
+
+def main():
+    catalog = GlassesCatalog.load(DB_PATH)
+    reference = EagerBackend(CHECKPOINT_PATH, catalog)
+    print(f"✅ Loaded checkpoint with hparams: {reference.hparams}")
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+
+    ts_path = os.path.join(ARTIFACT_DIR, TORCHSCRIPT_FILE)
+    export_torchscript(reference.scorer, reference.hparams, ts_path)
+    check_parity(reference, ts_path, TorchScriptBackend)
+
+    onnx_path = os.path.join(ARTIFACT_DIR, ONNX_FILE)
+    try:
+        export_onnx(reference.scorer, reference.hparams, onnx_path)
+        check_parity(reference, onnx_path, OnnxBackend)
+    except ImportError as e:
+        print(f"⚠️ Skipping ONNX export ({e}). Install onnx and onnxruntime to enable it.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw
+
+# Ensure main can be imported for in-process runs
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(SERVER_DIR)
+
+DEFAULT_RESOLUTIONS = ["640x480", "1280x960", "3024x4032"]
+DEFAULT_CONCURRENCY = [1, 8, 32]
+# Distinct base images per resolution; uploads are made unique on top of these
+IMAGE_POOL_SIZE = 8
+READY_TIMEOUT_SECONDS = 600
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def make_face_image(width, height, rng):
+    """Face-like JPEG with randomized tone, position and size."""
+    image = Image.new("RGB", (width, height), tuple(rng.randint(150, 230) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    cx = width * rng.uniform(0.4, 0.6)
+    cy = height * rng.uniform(0.4, 0.6)
+    rx = width * rng.uniform(0.14, 0.22)
+    ry = height * rng.uniform(0.24, 0.34)
+    skin = (rng.randint(180, 240), rng.randint(130, 190), rng.randint(100, 160))
+    draw.ellipse([cx - rx, cy - ry, cx + rx, cy + ry], fill=skin)
+    for ex in (cx - rx * 0.4, cx + rx * 0.4):
+        draw.ellipse([ex - rx * 0.12, cy - ry * 0.25, ex + rx * 0.12, cy - ry * 0.12], fill=(40, 30, 30))
+    draw.line([cx - rx * 0.35, cy + ry * 0.45, cx + rx * 0.35, cy + ry * 0.45], fill=(150, 60, 60), width=max(2, width // 160))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def make_features(rng):
+    return {
+        "cheek_jaw_ratio": round(rng.uniform(0.7, 1.3), 4),
+        "face_hw_ratio": round(rng.uniform(0.7, 1.3), 4),
+        "midface_ratio": round(rng.uniform(0.7, 1.3), 4)
+    }
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(name, concurrency, latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda seconds: None if seconds is None else round(seconds * 1000, 3)
+    return {
+        "endpoint": name,
+        "concurrency": concurrency,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 3) if elapsed > 0 else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else None
+    }
+
+async def drive(client, send, total, concurrency):
+    """Runs `total` calls of send(client, i) with at most `concurrency` in flight. Returns (latencies, errors, elapsed)."""
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await send(client, i)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - start
+
+def recommend_sender(images, features, unique=True):
+    """
+    Uploads cycle through `images`. With unique=True a counter is appended after the
+    JPEG end marker: decoders ignore it, but every upload hashes differently, so the
+    classification cache never short-circuits the vision pipeline.
+    """
+    nonce = itertools.count()
+
+    async def send(client, i):
+        contents = images[i % len(images)]
+        if unique:
+            contents += next(nonce).to_bytes(8, "little")
+        files = {"file": ("face.jpg", contents, "image/jpeg")}
+        data = {"features": json.dumps(features[i % len(features)])}
+        return await client.post("/recommend", files=files, data=data)
+    return send
+
+def feedback_sender(features, num_items):
+    async def send(client, i):
+        feats = features[i % len(features)]
+        return await client.post("/feedback", json={
+            "glass_id": i % max(1, num_items),
+            "detected_face_shape": i % 5,
+            "features": [feats["cheek_jaw_ratio"], feats["face_hw_ratio"], feats["midface_ratio"]],
+            "liked": i % 2 == 0
+        })
+    return send
+
+async def wait_until_ready(client, timeout=READY_TIMEOUT_SECONDS):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return response.json()
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError(f"Service was not ready after {timeout}s")
+
+def isolate_environment():
+    """
+    Offline ViT loading and a throwaway feedback database, so a load test never
+    contacts the hub or pollutes the feedback the recommender is trained on.
+    """
+    os.environ.setdefault("VIT_OFFLINE", "1")
+    os.environ.setdefault("FEEDBACK_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="load_test_"), "feedback.db"))
+
+def start_uvicorn(port, workers):
+    env = dict(os.environ)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=SERVER_DIR,
+        env=env
+    )
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def run_phases(client, args, rng):
+    ready = await wait_until_ready(client)
+    print(f"✅ Service ready: {ready}")
+
+    features = [make_features(rng) for _ in range(256)]
+    phases = []
+    for resolution in args.resolutions:
+        width, height = parse_resolution(resolution)
+        pool_size = 1 if args.reuse_images else IMAGE_POOL_SIZE
+        images = [make_face_image(width, height, rng) for _ in range(pool_size)]
+        phases.append((f"/recommend@{resolution}", recommend_sender(images, features, unique=not args.reuse_images)))
+    if not args.skip_feedback:
+        phases.append(("/feedback", feedback_sender(features, args.num_items)))
+
+    results = []
+    for name, send in phases:
+        for concurrency in args.concurrency:
+            await drive(client, send, args.warmup, concurrency)
+            latencies, errors, elapsed = await drive(client, send, args.requests, concurrency)
+            summary = summarize(name, concurrency, latencies, errors, elapsed)
+            results.append(summary)
+            print(f"{name:<28} c={concurrency:<4} rps={summary['rps']!s:<9} p50={summary['p50_ms']}ms "
+                  f"p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms errors={errors}")
+    return results
+
+async def run_in_process(args, rng):
+    import httpx
+
+    os.chdir(SERVER_DIR) # main.py resolves its database and artifact paths relative to server/
+    import main as server_app
+
+    # ASGITransport doesn't send lifespan events, so run the app's startup/shutdown hooks here
+    async with server_app.app.router.lifespan_context(server_app.app):
+        transport = httpx.ASGITransport(app=server_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            return await run_phases(client, args, rng)
+
+async def run_against_server(args, rng, base_url):
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        return await run_phases(client, args, rng)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of /recommend and /feedback (needs httpx).")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "url"], default="inprocess",
+                        help="inprocess: ASGI transport, no sockets; uvicorn: start a local server; url: use --url")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers (uvicorn mode)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per endpoint and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--resolutions", nargs="+", default=DEFAULT_RESOLUTIONS)
+    parser.add_argument("--reuse-images", action="store_true", help="Resend one identical image per resolution (measures cache hits)")
+    parser.add_argument("--skip-feedback", action="store_true")
+    parser.add_argument("--num-items", type=int, default=45, help="glass_id range for /feedback payloads")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results path (default: load_test_<timestamp>.json)")
+    args = parser.parse_args()
+
+    # In-process runs chdir into server/, so pin the report path to the caller's directory first
+    args.output = os.path.abspath(args.output or f"load_test_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    rng = random.Random(args.seed)
+    isolate_environment()
+    server = None
+    try:
+        if args.mode == "inprocess":
+            results = asyncio.run(run_in_process(args, rng))
+        else:
+            base_url = args.url
+            if args.mode == "uvicorn":
+                server = start_uvicorn(args.port, args.workers)
+                base_url = f"http://127.0.0.1:{args.port}"
+            results = asyncio.run(run_against_server(args, rng, base_url))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "uvicorn" else None,
+        "host": {"cpus": os.cpu_count(), "platform": platform.platform(), "python": platform.python_version()},
+        "settings": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "resolutions": args.resolutions,
+            "reuse_images": args.reuse_images,
+            "seed": args.seed
+        },
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"✅ Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
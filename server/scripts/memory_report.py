@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import sys
+
+# Ensure services can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.shared_memory import process_memory, child_pids
+
+COLUMNS = ("rss", "pss", "shared", "private")
+
+def collect(master_pid):
+    rows = [{"pid": master_pid, "role": "master", **(process_memory(master_pid) or {})}]
+    for pid in child_pids(master_pid):
+        memory = process_memory(pid)
+        if memory is not None:
+            rows.append({"pid": pid, "role": "worker", **memory})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-process RSS/PSS of a server master and its workers (Linux, reads /proc)."
+    )
+    parser.add_argument("pid", type=int, help="PID of the gunicorn / uvicorn master process")
+    parser.add_argument("--output", default=None, help="Optional path for a JSON copy of the report")
+    args = parser.parse_args()
+
+    rows = collect(args.pid)
+    workers = [row for row in rows if row["role"] == "worker"]
+    if not workers:
+        print(f"⚠️ Process {args.pid} has no child processes.")
+
+    print("\n" + "="*64)
+    print(f" MEMORY PER PROCESS (MB) — master {args.pid}, {len(workers)} workers")
+    print("="*64)
+    print(f"{'pid':>8} {'role':<7} " + " ".join(f"{column:>9}" for column in COLUMNS))
+    for row in rows:
+        print(f"{row['pid']:>8} {row['role']:<7} " + " ".join(f"{row.get(column, 0):>9.1f}" for column in COLUMNS))
+
+    # RSS counts shared pages once per process; PSS splits them between the sharers
+    total_rss = sum(row.get("rss", 0) for row in rows)
+    total_pss = sum(row.get("pss", 0) for row in rows)
+    summary = {
+        "processes": len(rows),
+        "total_rss_mb": round(total_rss, 1),
+        "total_pss_mb": round(total_pss, 1),
+        "shared_saving_mb": round(total_rss - total_pss, 1),
+        "mean_worker_pss_mb": round(sum(row.get("pss", 0) for row in workers) / max(1, len(workers)), 1)
+    }
+    print("-"*64)
+    print(f"Sum of RSS (no sharing):  {summary['total_rss_mb']:.1f} MB")
+    print(f"Sum of PSS (actual):      {summary['total_pss_mb']:.1f} MB")
+    print(f"Saved by sharing:         {summary['shared_saving_mb']:.1f} MB")
+    print(f"Mean PSS per worker:      {summary['mean_worker_pss_mb']:.1f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"processes": rows, "summary": summary}, f, indent=4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import torch
+
+# Ensure models can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.backends import EagerBackend
+from models.checkpoints import latest_checkpoint
+from models.retrieval import CandidateIndex
+from database.catalog import GlassesCatalog
+from scripts.synthetic_data import NUM_SHAPES
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DB_PATH = os.path.join(SERVER_DIR, 'database', 'glasses_database.json')
+DEFAULT_CANDIDATES = [16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+def exhaustive_top_k(backend, catalog, shapes, vecs, k):
+    client = torch.from_numpy(catalog.client_features(vecs))
+    return torch.topk(backend(shapes, client), k, dim=1).indices
+
+def two_stage_top_k(backend, catalog, index, shapes, vecs, n, k):
+    """Returns (candidate ids, final top-k ids) for the two-stage path."""
+    face_hw = torch.from_numpy(vecs[:, 1].astype(np.float32))
+    item_ids = index.candidates(shapes, face_hw, n)
+    client = torch.from_numpy(catalog.client_features(vecs, item_ids.numpy()))
+    scores = backend.score_candidates(shapes, client, item_ids)
+    return item_ids, item_ids.gather(1, torch.topk(scores, min(k, n), dim=1).indices)
+
+def overlap(found, reference):
+    """Mean fraction of each row of `reference` that also appears in the same row of `found`."""
+    hits = (found.unsqueeze(2) == reference.unsqueeze(1)).any(dim=1)
+    return hits.float().mean().item()
+
+def timed(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return result, timings[len(timings) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@N of two-stage retrieval against exhaustive scoring.")
+    parser.add_argument("--users", type=int, default=256)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=DEFAULT_CANDIDATES)
+    parser.add_argument("--width-tolerance", type=float, default=0.25)
+    parser.add_argument("--repeats", type=int, default=5, help="Timed repetitions per setting (median is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--model", default=None, help="Checkpoint (defaults to the newest version)")
+    parser.add_argument("--output", default=None, help="Optional path for a JSON copy of the results")
+    args = parser.parse_args()
+
+    catalog = GlassesCatalog.load(args.db)
+    model_path = args.model or latest_checkpoint()[1]
+    backend = EagerBackend(model_path, catalog)
+    state_dict = torch.load(model_path, map_location=torch.device('cpu'))
+    index = CandidateIndex.from_state_dict(state_dict, catalog, width_tolerance=args.width_tolerance)
+
+    rng = np.random.default_rng(args.seed)
+    shapes = torch.from_numpy(rng.integers(0, NUM_SHAPES, args.users))
+    vecs = rng.uniform(0.7, 1.3, (args.users, 3))
+    k = min(args.k, len(catalog))
+
+    reference, exhaustive_time = timed(lambda: exhaustive_top_k(backend, catalog, shapes, vecs, k), args.repeats)
+
+    print("\n" + "="*70)
+    print(f" TWO-STAGE RETRIEVAL vs EXHAUSTIVE ({len(catalog)} items, {args.users} users, K={k})")
+    print("="*70)
+    print(f"{'N':>8} | {'recall@N':>9} | {'top-K overlap':>13} | {'ms/request':>10} | {'speedup':>7}")
+    print(f"{'all':>8} | {1.0:>9.4f} | {1.0:>13.4f} | {exhaustive_time * 1000 / args.users:>10.4f} | {1.0:>6.2f}x")
+
+    results = {
+        "catalog_size": len(catalog),
+        "users": args.users,
+        "k": k,
+        "width_tolerance": args.width_tolerance,
+        "exhaustive_ms_per_request": exhaustive_time * 1000 / args.users,
+        "settings": []
+    }
+    for n in sorted(set(args.candidates)):
+        if n >= len(catalog):
+            continue
+        (item_ids, top_ids), two_stage_time = timed(
+            lambda: two_stage_top_k(backend, catalog, index, shapes, vecs, n, k), args.repeats
+        )
+        row = {
+            "n": n,
+            # Share of the exhaustive top-K that survives candidate generation
+            "recall_at_n": overlap(item_ids, reference),
+            # Share of the exhaustive top-K that the two-stage path actually returns
+            "top_k_overlap": overlap(top_ids, reference),
+            "ms_per_request": two_stage_time * 1000 / args.users,
+            "speedup": exhaustive_time / max(two_stage_time, 1e-9)
+        }
+        results["settings"].append(row)
+        print(f"{n:>8} | {row['recall_at_n']:>9.4f} | {row['top_k_overlap']:>13.4f} | "
+              f"{row['ms_per_request']:>10.4f} | {row['speedup']:>6.2f}x")
+
+    if not results["settings"]:
+        print("⚠️ Every candidate count is at least the catalog size; two-stage retrieval would not be used.")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
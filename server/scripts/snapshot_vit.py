@@ -0,0 +1,22 @@
+import os
+import sys
+
+# Ensure services can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from transformers import ViTImageProcessor, ViTForImageClassification
+from services.classifier import VIT_MODEL_NAME
+import config
+
+def main():
+    """Downloads the face-shape ViT once and stores it as a local safetensors snapshot."""
+    print(f"⬇️ Fetching {VIT_MODEL_NAME} from the HuggingFace hub...")
+    processor = ViTImageProcessor.from_pretrained(VIT_MODEL_NAME)
+    model = ViTForImageClassification.from_pretrained(VIT_MODEL_NAME)
+
+    os.makedirs(config.VIT_SNAPSHOT_DIR, exist_ok=True)
+    processor.save_pretrained(config.VIT_SNAPSHOT_DIR)
+    model.save_pretrained(config.VIT_SNAPSHOT_DIR, safe_serialization=True)
+    print(f"✅ Snapshot saved to {config.VIT_SNAPSHOT_DIR} (loads offline, memory-mapped)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+import traceback
+
+import torch
+import pytorch_lightning as pl
+
+# Ensure models, scripts and tests can be imported (also inside spawned run processes)
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(SERVER_DIR)
+from database.catalog import GlassesCatalog
+from scripts import train_recommendation as train
+from tests.evaluate_hybrid_neumf import EvaluationEngine, DB_PATH, K
+
+# Tunable hyperparameters -> (type, default from train_recommendation)
+PARAMETERS = {
+    "batch_size": (int, train.BATCH_SIZE),
+    "lr": (float, train.LEARNING_RATE),
+    "factor_num": (int, train.FACTOR_NUM),
+    "epochs": (int, train.EPOCHS),
+    "feedback_oversample": (int, train.FEEDBACK_OVERSAMPLE),
+    "samples_per_epoch": (int, train.SAMPLES_PER_EPOCH),
+}
+SWEEP_ROOT = os.path.join(SERVER_DIR, "sweeps")
+SUMMARY_COLUMNS = ["run", "status", "ndcg", "hr", "hr_noisy", "coverage", "epochs_run", "train_seconds", "checkpoint"]
+
+def parse_param(text):
+    """'lr=0.001,0.002' -> ('lr', [0.001, 0.002]); 'lr=1e-4:1e-2:log' -> ('lr', {'min', 'max', 'log'})."""
+    name, _, values = text.partition("=")
+    if name not in PARAMETERS or not values:
+        raise argparse.ArgumentTypeError(f"expected one of {sorted(PARAMETERS)} as name=v1,v2 or name=min:max[:log]")
+    cast = PARAMETERS[name][0]
+    if ":" in values:
+        low, high, *scale = values.split(":")
+        return name, {"min": cast(low), "max": cast(high), "log": scale == ["log"]}
+    return name, [cast(value) for value in values.split(",")]
+
+def load_spec(args):
+    """
+    A search spec is {"method": "grid"|"random", "samples": N, "parameters": {name: values}},
+    where values is a list of choices or (random search only) {"min", "max", "log"}.
+    Read from --spec, then overridden by --method / --samples / --param.
+    """
+    spec = {"method": "grid", "samples": 8, "parameters": {}}
+    if args.spec:
+        with open(args.spec, "r") as f:
+            spec.update(json.load(f))
+    if args.method:
+        spec["method"] = args.method
+    if args.samples:
+        spec["samples"] = args.samples
+    spec["parameters"] = {**spec["parameters"], **dict(args.param or [])}
+
+    unknown = set(spec["parameters"]) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown hyperparameters: {sorted(unknown)}")
+    if not spec["parameters"]:
+        raise ValueError("The search spec has no parameters to sweep")
+    if spec["method"] == "grid" and any(isinstance(v, dict) for v in spec["parameters"].values()):
+        raise ValueError("Grid search needs a list of values for every parameter")
+    return spec
+
+def sample_value(name, values, rng):
+    if isinstance(values, list):
+        return rng.choice(values)
+    cast = PARAMETERS[name][0]
+    low, high = values["min"], values["max"]
+    if values.get("log"):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return round(value) if cast is int else value
+
+def expand_spec(spec, seed=0):
+    """Concrete configurations (every tunable hyperparameter filled in) for a search spec."""
+    defaults = {name: default for name, (_, default) in PARAMETERS.items()}
+    parameters = spec["parameters"]
+    if spec["method"] == "grid":
+        names = list(parameters)
+        return [{**defaults, **dict(zip(names, combo))} for combo in itertools.product(*parameters.values())]
+    if spec["method"] == "random":
+        rng = random.Random(seed)
+        return [
+            {**defaults, **{name: sample_value(name, values, rng) for name, values in parameters.items()}}
+            for _ in range(spec["samples"])
+        ]
+    raise ValueError(f"Unknown search method: {spec['method']}")
+
+def partition_cores(num_runs, parallel=None, threads_per_run=None):
+    """Splits the usable CPUs into disjoint sets, one per concurrent run."""
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+    if parallel is None:
+        parallel = len(cores) // threads_per_run if threads_per_run else num_runs
+    parallel = max(1, min(parallel, num_runs, len(cores)))
+    per_run = max(1, min(threads_per_run or len(cores), len(cores) // parallel))
+    return [cores[i * per_run:(i + 1) * per_run] for i in range(parallel)]
+
+def claim_cores(slots):
+    """Pool initializer: pins this worker to one core set for its whole lifetime."""
+    cores = slots.get()
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(len(cores))
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass # already set once this process ran a parallel op
+
+class MedianPruner(pl.Callback):
+    """
+    Median stopping rule: every eval_every epochs the run scores NDCG@K on a small
+    user sample and posts it to the shared history. Past grace_epochs, a run whose
+    score is more than `margin` below the median of at least min_peers other runs
+    at the same epoch stops training.
+    """
+    def __init__(self, run_id, catalog, history, k, users, eval_every, grace_epochs, min_peers, margin, seed):
+        self.run_id = run_id
+        self.catalog = catalog
+        self.history = history
+        self.k = k
+        self.users = users
+        self.eval_every = eval_every
+        self.grace_epochs = grace_epochs
+        self.min_peers = min_peers
+        self.margin = margin
+        self.seed = seed
+        self.pruned_at = None
+
+    def on_train_epoch_end(self, trainer, pl_module):
+        epoch = trainer.current_epoch + 1
+        if epoch % self.eval_every or epoch >= trainer.max_epochs:
+            return
+        ndcg = EvaluationEngine(self.catalog, pl_module, k=self.k).evaluate(self.users, seed=self.seed)["ndcg"]
+        self.history[(self.run_id, epoch)] = ndcg
+
+        peers = [value for (run_id, at), value in self.history.items() if at == epoch and run_id != self.run_id]
+        if epoch < self.grace_epochs or len(peers) < self.min_peers:
+            return
+        if ndcg < statistics.median(peers) - self.margin:
+            self.pruned_at = epoch
+            trainer.should_stop = True
+
+def run_config(job):
+    """Trains and evaluates one configuration. Runs in a pool worker; never raises."""
+    run_id, config, options, history = job
+    row = {"run": run_id, **config, "status": "failed", "epochs_run": 0}
+    start = time.perf_counter()
+    try:
+        torch.manual_seed(options["seed"])
+        catalog = GlassesCatalog.load(options["db"])
+        real_feedback, _ = train.load_real_feedback(oversample=config["feedback_oversample"])
+
+        pruner = None
+        callbacks = []
+        if options["prune"]:
+            pruner = MedianPruner(
+                run_id, catalog, history, options["k"], options["probe_users"], options["eval_every"],
+                options["grace_epochs"], options["min_peers"], options["margin"], options["seed"] + 1
+            )
+            callbacks.append(pruner)
+
+        trainer = train.build_trainer(
+            config["epochs"], accelerator="cpu", precision=options["precision"], callbacks=callbacks, quiet=True
+        )
+        model = train.train_from_scratch(
+            catalog, real_feedback, config["epochs"], lr=config["lr"], batch_size=config["batch_size"],
+            factor_num=config["factor_num"], samples_per_epoch=config["samples_per_epoch"], trainer=trainer
+        )
+        row["train_seconds"] = round(time.perf_counter() - start, 1)
+        row["epochs_run"] = trainer.current_epoch
+
+        checkpoint = os.path.join(options["output_dir"], f"run_{run_id:03d}.pth")
+        torch.save(model.state_dict(), checkpoint)
+        row["checkpoint"] = os.path.basename(checkpoint)
+
+        results = EvaluationEngine(catalog, model, k=options["k"]).evaluate(options["eval_users"], seed=options["seed"])
+        row.update({key: round(results[key], 4) for key in ("hr", "ndcg", "hr_noisy", "coverage")})
+        row["status"] = f"pruned@{pruner.pruned_at}" if pruner and pruner.pruned_at else "completed"
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+        row["traceback"] = traceback.format_exc()
+        row["train_seconds"] = round(time.perf_counter() - start, 1)
+    return row
+
+def format_row(row, columns):
+    return "  ".join(f"{str(row.get(column, '')):<{width}}" for column, width in columns)
+
+def write_summary(rows, output_dir):
+    """Writes summary.csv / summary.json (best NDCG first) and prints the table."""
+    rows = sorted(rows, key=lambda row: row.get("ndcg", -1.0), reverse=True)
+    fieldnames = ["run", *PARAMETERS, *SUMMARY_COLUMNS[1:], "error"]
+    with open(os.path.join(output_dir, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(output_dir, "summary.json"), "w") as f:
+        json.dump(rows, f, indent=4)
+
+    columns = [("run", 4), *[(name, 10) for name in PARAMETERS], ("status", 10), ("ndcg", 7), ("hr", 7),
+               ("hr_noisy", 8), ("epochs_run", 10), ("train_seconds", 13)]
+    print("\n" + "="*70)
+    print(" SWEEP SUMMARY (best NDCG first)")
+    print("="*70)
+    print(format_row({column: column for column, _ in columns}, columns))
+    for row in rows:
+        print(format_row(row, columns))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep for the HybridNeuMF recommender.")
+    parser.add_argument("--spec", default=None, help="JSON search spec (see load_spec)")
+    parser.add_argument("--method", choices=["grid", "random"], default=None)
+    parser.add_argument("--samples", type=int, default=None, help="Configurations drawn by random search")
+    parser.add_argument("--param", type=parse_param, action="append",
+                        help="name=v1,v2 (choices) or name=min:max[:log] (random range); repeatable")
+    parser.add_argument("--parallel", type=int, default=None, help="Concurrent runs (default: cores / --threads-per-run)")
+    parser.add_argument("--threads-per-run", type=int, default=None, help="CPU cores pinned to each run")
+    parser.add_argument("--k", type=int, default=K)
+    parser.add_argument("--eval-users", type=int, default=1000, help="Users for the final HR/NDCG evaluation")
+    parser.add_argument("--no-prune", action="store_true", help="Train every configuration to completion")
+    parser.add_argument("--probe-users", type=int, default=200, help="Users per intermediate NDCG probe")
+    parser.add_argument("--eval-every", type=int, default=2, help="Epochs between NDCG probes")
+    parser.add_argument("--grace-epochs", type=int, default=4, help="No run is stopped before this epoch")
+    parser.add_argument("--min-peers", type=int, default=3, help="Other runs needed at an epoch before pruning")
+    parser.add_argument("--margin", type=float, default=0.02, help="NDCG below the peer median that counts as losing")
+    parser.add_argument("--precision", default="32-true", help="Lightning precision for the CPU runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--output-dir", default=None, help="Checkpoints and summary (default: sweeps/<timestamp>)")
+    args = parser.parse_args()
+
+    spec = load_spec(args)
+    configs = expand_spec(spec, seed=args.seed)
+    slots = partition_cores(len(configs), args.parallel, args.threads_per_run)
+    output_dir = args.output_dir or os.path.join(SWEEP_ROOT, time.strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "spec.json"), "w") as f:
+        json.dump({**spec, "configs": configs}, f, indent=4)
+
+    print(f"🚀 Sweeping {len(configs)} configurations ({spec['method']}), {len(slots)} at a time "
+          f"with {len(slots[0])} cores each -> {output_dir}")
+
+    options = {
+        "db": args.db, "k": args.k, "eval_users": args.eval_users, "prune": not args.no_prune,
+        "probe_users": args.probe_users, "eval_every": args.eval_every, "grace_epochs": args.grace_epochs,
+        "min_peers": args.min_peers, "margin": args.margin, "precision": args.precision,
+        "seed": args.seed, "output_dir": output_dir
+    }
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        history = manager.dict() # (run, epoch) -> probe NDCG, shared by every run for pruning
+        core_slots = context.Queue()
+        for cores in slots:
+            core_slots.put(cores)
+
+        rows = []
+        jobs = [(run_id, config, options, history) for run_id, config in enumerate(configs)]
+        with context.Pool(len(slots), initializer=claim_cores, initargs=(core_slots,)) as pool:
+            for row in pool.imap_unordered(run_config, jobs):
+                rows.append(row)
+                if "error" in row:
+                    print(f"❌ run {row['run']} failed: {row['error']}")
+                else:
+                    print(f"✅ run {row['run']} {row['status']}: NDCG@{args.k}={row['ndcg']} HR@{args.k}={row['hr']} "
+                          f"({row['epochs_run']} epochs, {row['train_seconds']}s)")
+
+    rows = write_summary(rows, output_dir)
+    best = next((row for row in rows if "ndcg" in row), None)
+    if best:
+        print(f"\n🏆 Best: run {best['run']} " + " ".join(f"{name}={best[name]}" for name in PARAMETERS)
+              + f" -> {os.path.join(output_dir, best['checkpoint'])}")
+    print(f"✅ Summary saved to {os.path.join(output_dir, 'summary.csv')}")
+
+if __name__ == "__main__":
+    main()
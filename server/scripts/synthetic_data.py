@@ -0,0 +1,104 @@
+import math
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+NUM_SHAPES = 5
+
+def synthetic_scores(u_shape, face_hw, item_width, item_height, item_shape):
+    """
+    Vectorized synthetic ground truth (the same rules the recommender is trained on).
+    All arguments broadcast: pass (B,) arrays for paired samples or (U, 1) user
+    columns against (1, N) item rows for a full (users x items) score matrix.
+    Additions happen in the same order as the scalar rules, so ties stay exact.
+    """
+    u_shape = np.asarray(u_shape)
+    item_shape = np.asarray(item_shape)
+
+    score = np.full(np.broadcast(u_shape, item_width).shape, 0.4)
+
+    # Categorical Logic (Shape matching)
+    score += np.where((u_shape == 1) & (item_height > 0.55), 0.4, 0.0)
+    score += np.where((u_shape == 3) & np.isin(item_shape, [2, 4]), 0.4, 0.0)
+    score += np.where((u_shape == 0) & np.isin(item_shape, [0, 4]), 0.4, 0.0)
+    score += np.where(u_shape == 2, 0.4, 0.0)
+    score += np.where((u_shape == 4) & np.isin(item_shape, [1, 0]), 0.6,
+                      np.where((u_shape == 4) & (item_shape == 2), -0.4, 0.0))
+
+    # Continuous Logic (Size matching)
+    width_diff = np.abs(face_hw - item_width)
+    score += np.where(width_diff < 0.15, 0.3, np.where(width_diff > 0.25, -0.3, 0.0))
+    return score
+
+class SyntheticBatchStream(IterableDataset):
+    """
+    Batch-native replacement for per-sample dataset generation. Each step draws a
+    whole batch of shapes, user vectors and item indices with NumPy, labels it with
+    synthetic_scores against the catalog's precomputed feature matrix and yields
+    ready-made tensors. Use with DataLoader(batch_size=None).
+
+    Real feedback rows are mixed in at the same rate as the old synthetic + feedback
+    concatenation (each slot is feedback with probability F / (size + F)).
+    """
+    def __init__(self, size, catalog, real_feedback=[], batch_size=256, seed=None):
+        self.size = size
+        self.batch_size = batch_size
+        self.seed = seed
+        self.item_features = catalog.features
+        self.item_shape_ids = catalog.shape_ids
+        self.num_items = len(catalog)
+
+        # Feedback as columns, converted once
+        self.num_feedback = len(real_feedback)
+        self.fb_items = np.array([row['glass_id'] for row in real_feedback], dtype=np.int64)
+        self.fb_shapes = np.array([row['shape_id'] for row in real_feedback], dtype=np.int64)
+        self.fb_vecs = np.array([[row['cj'], row['hw'], row['mid']] for row in real_feedback], dtype=np.float64).reshape(-1, 3)
+        # Strong signals: 1.2 for liked, -0.2 for disliked
+        self.fb_labels = np.array([1.2 if row['liked'] else -0.2 for row in real_feedback], dtype=np.float64)
+
+        self.total_size = self.size + self.num_feedback
+
+    def __len__(self):
+        return math.ceil(self.total_size / self.batch_size)
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+        seed = None if self.seed is None else self.seed + worker_id
+        rng = np.random.default_rng(seed)
+
+        for batch_idx in range(worker_id, len(self), num_workers):
+            start = batch_idx * self.batch_size
+            yield self._make_batch(rng, min(self.batch_size, self.total_size - start))
+
+    def _make_batch(self, rng, batch):
+        u_shape = rng.integers(0, NUM_SHAPES, batch)
+        u_vec = rng.uniform(0.7, 1.3, (batch, 3))
+        item_idx = rng.integers(0, self.num_items, batch)
+
+        g_vec = self.item_features[item_idx]
+        labels = synthetic_scores(
+            u_shape, u_vec[:, 1], g_vec[:, 0], g_vec[:, 1], self.item_shape_ids[item_idx]
+        )
+
+        # --- REAL USER FEEDBACK SLOTS ---
+        if self.num_feedback:
+            is_feedback = rng.random(batch) < self.num_feedback / self.total_size
+            picks = rng.integers(0, self.num_feedback, int(is_feedback.sum()))
+            u_shape[is_feedback] = self.fb_shapes[picks]
+            u_vec[is_feedback] = self.fb_vecs[picks]
+            item_idx[is_feedback] = self.fb_items[picks]
+            labels[is_feedback] = self.fb_labels[picks]
+            g_vec = self.item_features[item_idx]
+
+        # Engineered feature: width_diff = |face_hw - item width|
+        width_diff = np.abs(u_vec[:, 1] - g_vec[:, 0])
+        client = np.concatenate([u_vec, width_diff[:, None]], axis=1)
+
+        return (
+            torch.from_numpy(u_shape),
+            torch.from_numpy(item_idx),
+            torch.from_numpy(client.astype(np.float32)),
+            torch.from_numpy(np.ascontiguousarray(g_vec, dtype=np.float32)),
+            torch.from_numpy(labels.astype(np.float32))
+        )
@@ -1,15 +1,19 @@
+import argparse
 import torch
 import pytorch_lightning as pl
-from torch.utils.data import Dataset, DataLoader
-import json
-import numpy as np
+from torch.utils.data import DataLoader
 import os
 import sys
 import sqlite3
 
 # Ensure models can be imported
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from models.model import HybridNeuMF
+from models.model import HybridNeuMF, load_hybrid_neumf
+from models.checkpoints import (
+    BASE_CHECKPOINT, latest_checkpoint, save_versioned_checkpoint, load_train_state, save_train_state
+)
+from database.catalog import GlassesCatalog
+from scripts.synthetic_data import SyntheticBatchStream
 
 # --- OPTIMIZED HYPERPARAMETERS ---
 NUM_SHAPES = 5
@@ -20,98 +24,23 @@ EPOCHS = 30
 SAMPLES_PER_EPOCH = 128 * 1000 
 FEEDBACK_OVERSAMPLE = 20 # How many times to repeat real feedback per epoch so it isn't ignored
 
-class GlassesDataset(Dataset):
-    def __init__(self, size, glasses_db, real_feedback=[]):
-        self.size = size
-        self.glasses_db = glasses_db
-        self.num_items = len(glasses_db)
-        self.real_feedback = real_feedback
-        
-        # Total size is synthetic samples + oversampled real feedback
-        self.total_size = self.size + len(self.real_feedback)
-
-    def __len__(self):
-        return self.total_size
-
-    def __getitem__(self, idx):
-        # --- 1. REAL USER FEEDBACK PATH ---
-        if idx < len(self.real_feedback):
-            row = self.real_feedback[idx]
-            item_idx = row['glass_id']
-            u_shape = row['shape_id']
-            u_vec = [row['cj'], row['hw'], row['mid']]
-            liked = row['liked']
-            
-            # Fetch item features safely
-            g = self.glasses_db.get(str(item_idx), {})
-            g_vec = [
-                g.get('width', 0.5), g.get('height', 0.5), 
-                g.get('bridge_pos', 0.5), g.get('normalized_material', 0.0), 
-                g.get('normalized_rim', 0.0)
-            ]
-            
-            # Recreate engineered feature
-            width_diff = abs(u_vec[1] - g_vec[0])
-            u_vec_extended = u_vec + [width_diff]
-            
-            # Strong signals: 1.2 for liked, -0.2 for disliked
-            final_label = 1.2 if liked else -0.2
-            
-            return (
-                torch.tensor(u_shape, dtype=torch.long), 
-                torch.tensor(item_idx, dtype=torch.long), 
-                torch.tensor(u_vec_extended, dtype=torch.float32),
-                torch.tensor(g_vec, dtype=torch.float32), 
-                torch.tensor(final_label, dtype=torch.float32)
-            )
-
-        # --- 2. SYNTHETIC GENERATION PATH ---
-        u_shape = np.random.randint(0, NUM_SHAPES)
-        u_vec = [np.random.uniform(0.7, 1.3) for _ in range(3)]
-        
-        item_idx = np.random.randint(0, self.num_items)
-        g = self.glasses_db[str(item_idx)]
-        g_vec = [
-            g.get('width', 0.5), g.get('height', 0.5), 
-            g.get('bridge_pos', 0.5), g.get('normalized_material', 0.0), 
-            g.get('normalized_rim', 0.0)
-        ]
-        
-        score = 0.4 
-        
-        # Categorical Logic (Shape matching)
-        if u_shape == 1 and g_vec[1] > 0.55: score += 0.4
-        if u_shape == 3 and g.get('shape_id') in [2, 4]: score += 0.4
-        if u_shape == 0 and g.get('shape_id') in [0, 4]: score += 0.4
-        if u_shape == 2: score += 0.4
-        if u_shape == 4:
-            if g.get('shape_id') in [1, 0]: score += 0.6
-            elif g.get('shape_id') == 2: score -= 0.4
-        
-        # Continuous Logic (Size matching)
-        width_diff = abs(u_vec[1] - g_vec[0])
-        if width_diff < 0.15: score += 0.3
-        elif width_diff > 0.25: score -= 0.3
+# --- INCREMENTAL FINE-TUNING ---
+INCREMENTAL_EPOCHS = 3
+INCREMENTAL_LEARNING_RATE = 0.0002
+REPLAY_SAMPLES = 8 * 1000 # Synthetic samples replayed per epoch so old rules aren't forgotten
 
-        u_vec_extended = u_vec + [width_diff]
-        final_label = score 
-        
-        return (
-            torch.tensor(u_shape, dtype=torch.long), 
-            torch.tensor(item_idx, dtype=torch.long), 
-            torch.tensor(u_vec_extended, dtype=torch.float32),
-            torch.tensor(g_vec, dtype=torch.float32), 
-            torch.tensor(final_label, dtype=torch.float32)
-        )
-
-def load_real_feedback():
-    """Reads feedback.db and returns a list of dictionaries."""
+def load_real_feedback(since_id=0, oversample=FEEDBACK_OVERSAMPLE):
+    """
+    Reads feedback.db rows with id > since_id.
+    Returns (list of dictionaries repeated `oversample` times, highest feedback.id seen).
+    """
     db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'feedback.db'))
     feedback_data = []
+    high_water_mark = since_id
     
     if not os.path.exists(db_path):
         print("⚠️ No feedback.db found. Training on synthetic data only.")
-        return feedback_data
+        return feedback_data, high_water_mark
         
     try:
         conn = sqlite3.connect(db_path)
@@ -121,19 +50,24 @@ def load_real_feedback():
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='feedback'")
         if not cursor.fetchone():
             print("⚠️ Feedback table does not exist yet. Training on synthetic data only.")
-            return feedback_data
+            return feedback_data, high_water_mark
 
-        cursor.execute("SELECT glass_id, detected_face_shape_id, cheek_jaw_ratio, face_hw_ratio, midface_ratio, liked FROM feedback")
+        cursor.execute(
+            "SELECT id, glass_id, detected_face_shape_id, cheek_jaw_ratio, face_hw_ratio, midface_ratio, liked "
+            "FROM feedback WHERE id > ? ORDER BY id",
+            (since_id,)
+        )
         rows = cursor.fetchall()
         
         for row in rows:
+            high_water_mark = max(high_water_mark, row[0])
             feedback_data.append({
-                'glass_id': row[0],
-                'shape_id': row[1],
-                'cj': row[2] if row[2] else 1.0,
-                'hw': row[3] if row[3] else 1.0,
-                'mid': row[4] if row[4] else 1.0,
-                'liked': bool(row[5])
+                'glass_id': row[1],
+                'shape_id': row[2],
+                'cj': row[3] if row[3] else 1.0,
+                'hw': row[4] if row[4] else 1.0,
+                'mid': row[5] if row[5] else 1.0,
+                'liked': bool(row[6])
             })
             
         conn.close()
@@ -141,63 +75,134 @@ def load_real_feedback():
         
         # Oversample real feedback so it has a strong impact
         if len(feedback_data) > 0:
-            oversampled_data = feedback_data * FEEDBACK_OVERSAMPLE
+            oversampled_data = feedback_data * oversample
             print(f"🔥 Oversampled to {len(oversampled_data)} interactions per epoch.")
-            return oversampled_data
+            return oversampled_data, high_water_mark
             
     except Exception as e:
         print(f"❌ Error loading feedback.db: {e}")
         
-    return feedback_data
+    return feedback_data, high_water_mark
+
+def build_trainer(epochs, accelerator="auto", precision="16-mixed", callbacks=None, quiet=False):
+    """quiet=True drops the progress bar, logger and checkpointing (for sweep runs)."""
+    return pl.Trainer(
+        max_epochs=epochs,
+        gradient_clip_val=1.0,
+        accelerator=accelerator,
+        devices=1,
+        precision=precision,
+        callbacks=callbacks,
+        enable_progress_bar=not quiet,
+        enable_model_summary=not quiet,
+        enable_checkpointing=not quiet,
+        logger=not quiet
+    )
+
+def train_from_scratch(catalog, real_feedback, epochs, lr=LEARNING_RATE, batch_size=BATCH_SIZE,
+                       factor_num=FACTOR_NUM, samples_per_epoch=SAMPLES_PER_EPOCH, trainer=None):
+    """Full training of a fresh HybridNeuMF. Returns the trained model."""
+    # Whole batches are generated and labelled with vectorized NumPy, and real
+    # feedback is mixed into every batch, so no worker processes are needed.
+    dataset = SyntheticBatchStream(samples_per_epoch, catalog, real_feedback, batch_size=batch_size)
+    train_loader = DataLoader(dataset, batch_size=None)
+
+    model = HybridNeuMF(
+        num_face_shapes=NUM_SHAPES,
+        num_items=len(catalog),
+        factor_num=factor_num,
+        lr=lr,
+        epochs=epochs
+    )
+
+    trainer = trainer or build_trainer(epochs)
+    trainer.fit(model, train_loader)
+    return model
+
+def save_new_version(model, high_water_mark):
+    """Writes the next versioned checkpoint and records which feedback it has seen."""
+    version, path = save_versioned_checkpoint(model.state_dict())
+    state = load_train_state()
+    state["feedback_high_water_mark"] = high_water_mark
+    state["latest_version"] = version
+    state["latest_checkpoint"] = os.path.basename(path)
+    save_train_state(state)
+    print(f"✅ Saved checkpoint v{version} to {path} (feedback up to id {high_water_mark})")
+    return version, path
+
+def fine_tune(catalog, epochs, lr, replay_samples):
+    """
+    Incremental mode: start from the newest checkpoint and train briefly on feedback
+    rows past the stored high-water mark, mixed with a synthetic replay sample.
+    """
+    state = load_train_state()
+    since_id = state.get("feedback_high_water_mark", 0)
+    new_feedback, high_water_mark = load_real_feedback(since_id=since_id)
+    if not new_feedback:
+        print(f"✅ No feedback newer than id {since_id}. Nothing to fine-tune.")
+        return
+
+    version, base_path = latest_checkpoint()
+    model = load_hybrid_neumf(base_path)
+    if model.hparams.num_items != len(catalog):
+        print(f"❌ Checkpoint has {model.hparams.num_items} items but the catalog has {len(catalog)}. Run a full retrain.")
+        return
+    model.lr = lr
+    model.epochs = epochs
+    model.train()
+    print(f"✅ Fine-tuning from v{version} ({base_path})")
+
+    dataset = SyntheticBatchStream(replay_samples, catalog, new_feedback, batch_size=BATCH_SIZE)
+    train_loader = DataLoader(dataset, batch_size=None)
+
+    trainer = build_trainer(epochs)
+    print(f"🚀 Fine-tuning for {epochs} Epochs on {dataset.total_size} samples...")
+    trainer.fit(model, train_loader)
+
+    save_new_version(model, high_water_mark)
 
 def main():
+    parser = argparse.ArgumentParser(description="Train the HybridNeuMF recommender.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fine-tune the latest checkpoint on feedback newer than the stored high-water mark")
+    parser.add_argument("--epochs", type=int, default=None)
+    parser.add_argument("--lr", type=float, default=None)
+    parser.add_argument("--replay-samples", type=int, default=REPLAY_SAMPLES)
+    args = parser.parse_args()
+
     # --- ROBUST DATABASE LOADING ---
     db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'database', 'glasses_database.json'))
     
     try:
-        with open(db_path, "r") as f:
-            glasses_db = json.load(f)
-        print(f"✅ Loaded {len(glasses_db)} glasses from catalog.")
+        catalog = GlassesCatalog.load(db_path)
+        print(f"✅ Loaded {len(catalog)} glasses from catalog.")
     except Exception as e:
         print(f"❌ CRITICAL ERROR: Could not load catalog!\nReason: {e}")
         return 
 
-    # --- LOAD REAL FEEDBACK ---
-    real_feedback = load_real_feedback()
-
-    # --- DATASET & DATALOADER ---
-    dataset = GlassesDataset(SAMPLES_PER_EPOCH, glasses_db, real_feedback)
-    
-    # Note: Because DataLoader shuffles the data, real feedback and synthetic
-    # data will be perfectly mixed together in the batches.
-    train_loader = DataLoader(dataset, batch_size=BATCH_SIZE, shuffle=True, num_workers=4, persistent_workers=True)
+    if args.incremental:
+        fine_tune(
+            catalog,
+            epochs=args.epochs or INCREMENTAL_EPOCHS,
+            lr=args.lr or INCREMENTAL_LEARNING_RATE,
+            replay_samples=args.replay_samples
+        )
+        return
 
-    # --- MODEL INITIALIZATION ---
-    model = HybridNeuMF(
-        num_face_shapes=NUM_SHAPES, 
-        num_items=len(glasses_db), 
-        factor_num=FACTOR_NUM,
-        lr=LEARNING_RATE,
-        epochs=EPOCHS
-    )
+    epochs = args.epochs or EPOCHS
 
-    # --- TRAINER ---
-    trainer = pl.Trainer(
-        max_epochs=EPOCHS,
-        gradient_clip_val=1.0,
-        accelerator="auto",
-        devices=1,
-        precision="16-mixed", 
-        enable_progress_bar=True
-    )
+    # --- LOAD REAL FEEDBACK ---
+    real_feedback, high_water_mark = load_real_feedback()
 
-    print(f"🚀 Starting Training for {EPOCHS} Epochs...")
-    trainer.fit(model, train_loader)
+    # --- TRAINING ---
+    print(f"🚀 Starting Training for {epochs} Epochs...")
+    model = train_from_scratch(catalog, real_feedback, epochs, lr=args.lr or LEARNING_RATE)
 
     # --- SAVING WEIGHTS ---
-    save_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'spectacular_hybrid.pth'))
-    torch.save(model.state_dict(), save_path)
-    print(f"✅ Training Complete! Model saved to {save_path}")
+    torch.save(model.state_dict(), BASE_CHECKPOINT)
+    print(f"✅ Training Complete! Model saved to {BASE_CHECKPOINT}")
+    # A full retrain has seen every feedback row, so later incremental runs start after them
+    save_new_version(model, high_water_mark)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
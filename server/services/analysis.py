@@ -0,0 +1,11 @@
+# server/services/analysis.py
+from dataclasses import dataclass
+
+@dataclass
+class FaceAnalysis:
+    """Result of the vision pipeline for one upload (kept import-light so it can cross processes)."""
+    face_shape: str
+    # Soft square crop fed to the ViT, [x1, y1, x2, y2] in original image pixels
+    crop_box: list[float]
+    face_detected: bool
+    logits: list[float]
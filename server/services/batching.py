@@ -0,0 +1,101 @@
+# server/services/batching.py
+import asyncio
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `window_ms` (or until `max_batch_size`
+    requests are waiting) and hands them to `run_batch` as one list.
+
+    `run_batch` is a coroutine function that receives the list of payloads and must
+    return one result per payload, in order. It is responsible for keeping heavy
+    work off the event loop (worker pool / executor). A result that is an Exception instance
+    is raised only in the awaiting request it belongs to.
+
+    Up to `max_in_flight` batches run concurrently (size it to the worker pool behind
+    run_batch). While all slots are busy, new requests keep queueing and form the next
+    batch as soon as one frees up.
+    """
+    def __init__(self, run_batch, max_batch_size=16, window_ms=5.0, max_in_flight=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_in_flight = max(1, max_in_flight)
+        self._queue = None
+        self._task = None
+        self._slots = None
+        self._running = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._task = asyncio.create_task(self._collect_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def submit(self, payload):
+        if self._task is None:
+            raise RuntimeError("MicroBatcher has not been started.")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    async def _collect_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Only start collecting once a batch slot is free
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+            except BaseException:
+                self._slots.release()
+                raise
+            deadline = loop.time() + self.window
+
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests whose client already went away are dropped before the heavy work
+            batch = [(payload, future) for payload, future in batch if not future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+
+            task = asyncio.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch):
+        """Runs one collected batch and resolves its futures; holds a batch slot until done."""
+        try:
+            payloads = [payload for payload, _ in batch]
+            try:
+                results = await self.run_batch(payloads)
+            except Exception as e:
+                results = [e] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+        finally:
+            self._slots.release()
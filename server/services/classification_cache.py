@@ -0,0 +1,186 @@
+# server/services/classification_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from services.analysis import FaceAnalysis
+
+class MemoryCacheBackend:
+    """In-process LRU with a byte budget and per-entry expiry."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # key -> (expires_at, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, ttl):
+        """Stores an entry and returns how many others were evicted to fit it."""
+        if len(payload) > self.max_bytes:
+            return 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + ttl, payload)
+            self._bytes += len(payload)
+
+            evicted = 0
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+            return evicted
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+class DiskCacheBackend:
+    """
+    SQLite file cache: survives restarts and is shared by every worker process
+    on the host. Least-recently-read entries are evicted past the byte budget.
+    """
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS classification_cache (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_access ON classification_cache(last_access)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        now = time.time()
+        row = conn.execute(
+            "SELECT payload FROM classification_cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE classification_cache SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        return row[0]
+
+    def set(self, key, payload, ttl):
+        if len(payload) > self.max_bytes:
+            return 0
+        conn = self._conn()
+        now = time.time()
+        with conn:
+            conn.execute("DELETE FROM classification_cache WHERE expires_at < ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO classification_cache (key, payload, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now + ttl, now)
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM classification_cache").fetchone()[0]
+            evicted = 0
+            while total > self.max_bytes:
+                oldest_key, size = conn.execute(
+                    "SELECT key, size FROM classification_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                conn.execute("DELETE FROM classification_cache WHERE key = ?", (oldest_key,))
+                total -= size
+                evicted += 1
+        return evicted
+
+def pipeline_namespace(model_name, snapshot_dir, precision, decode_max_side, detect_max_side):
+    """
+    Short hash of everything besides the upload that decides a FaceAnalysis: the ViT
+    (hub id plus the name, size and mtime of every snapshot file), its precision and
+    the ingest limits. Any change gives new keys, so a persistent cache never serves
+    results from a previous model or preprocessing.
+    """
+    parts = [model_name, precision, str(decode_max_side), str(detect_max_side)]
+    if os.path.isdir(snapshot_dir):
+        for name in sorted(os.listdir(snapshot_dir)):
+            stat = os.stat(os.path.join(snapshot_dir, name))
+            parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.blake2b("|".join(parts).encode(), digest_size=6).hexdigest()
+
+class ClassificationCache:
+    """
+    Content-addressed cache of FaceAnalysis results keyed by a hash of the upload bytes,
+    so re-submitting the same photo skips MTCNN and the ViT. Keys are prefixed with
+    `namespace` (see pipeline_namespace).
+    """
+    def __init__(self, backend, ttl_seconds, namespace=""):
+        self.backend = backend
+        self.ttl = ttl_seconds
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def key_for(self, image_bytes: bytes) -> str:
+        return f"{self.namespace}:{hashlib.blake2b(image_bytes, digest_size=16).hexdigest()}"
+
+    def get(self, key):
+        payload = self.backend.get(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return FaceAnalysis(**json.loads(payload))
+
+    def put(self, key, analysis: FaceAnalysis):
+        payload = json.dumps(asdict(analysis)).encode()
+        evicted = self.backend.set(key, payload, self.ttl)
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "namespace": self.namespace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+def build_classification_cache(kind, max_bytes, ttl_seconds, disk_path, namespace=""):
+    """Cache from config values; kind is "memory", "disk" or "off" (returns None)."""
+    if kind == "off":
+        return None
+    if kind == "memory":
+        backend = MemoryCacheBackend(max_bytes)
+    elif kind == "disk":
+        backend = DiskCacheBackend(disk_path, max_bytes)
+    else:
+        raise ValueError(f"Unknown classification cache backend: {kind}")
+    return ClassificationCache(backend, ttl_seconds, namespace)
@@ -1,81 +1,323 @@
 # server/services/classifier.py
 from transformers import ViTImageProcessor, ViTForImageClassification
 from facenet_pytorch import MTCNN
-from PIL import Image
+from PIL import Image, ImageDraw
+import numpy as np
 import torch
 import io
+import logging
 import os
+import threading
+import config
+from services.analysis import FaceAnalysis
+from services.logs import get_logger
+from services.metrics import stage_timer
+
+logger = get_logger("classifier")
+
+PRECISIONS = ("fp32", "int8", "bf16")
+VIT_MODEL_NAME = config.VIT_MODEL_NAME
+
+def synthetic_face_jpeg(size=(640, 480)) -> bytes:
+    """A cheap, deterministic face-like JPEG used to warm the pipeline without real photos."""
+    width, height = size
+    image = Image.new("RGB", size, (200, 200, 200))
+    draw = ImageDraw.Draw(image)
+    cx, cy, rx, ry = width / 2, height / 2, width * 0.18, height * 0.3
+    draw.ellipse([cx - rx, cy - ry, cx + rx, cy + ry], fill=(224, 172, 140))
+    for ex in (cx - rx * 0.4, cx + rx * 0.4):
+        draw.ellipse([ex - rx * 0.12, cy - ry * 0.25, ex + rx * 0.12, cy - ry * 0.12], fill=(40, 30, 30))
+    draw.line([cx - rx * 0.35, cy + ry * 0.45, cx + rx * 0.35, cy + ry * 0.45], fill=(150, 60, 60), width=4)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bf16 matmul support (AVX512-BF16 or AMX)."""
+    try:
+        return torch.cpu._is_avx512_bf16_supported() or torch.cpu._is_amx_tile_supported()
+    except AttributeError:
+        return False
 
 class FaceShapeClassifier:
-    def __init__(self):
-        print("🚀 Initializing AI Vision Pipeline...")
+    def __init__(self, precision: str = None):
+        logger.info("vision_pipeline_init")
         
         self.mtcnn = MTCNN(keep_all=False, margin=20, device='cpu') 
         
-        # 2. Load the Vision Transformer (ViT) from HuggingFace
-        self.model_name = "metadome/face_shape_classification"
+        # 2. Load the Vision Transformer (ViT): local safetensors snapshot first, hub otherwise
+        self.model_name = VIT_MODEL_NAME
         try:
-            self.processor = ViTImageProcessor.from_pretrained(self.model_name)
-            self.model = ViTForImageClassification.from_pretrained(self.model_name)
-            print("✅ Vision Transformer Loaded (metadome/face_shape_classification)")
+            source, hub_kwargs = self._vit_source()
+            self.processor = ViTImageProcessor.from_pretrained(source, **hub_kwargs)
+            self.model = ViTForImageClassification.from_pretrained(source, **hub_kwargs)
+            self._pixel_mean = torch.tensor(self.processor.image_mean).view(3, 1, 1)
+            self._pixel_std = torch.tensor(self.processor.image_std).view(3, 1, 1)
+            logger.info("vit_loaded", extra={"fields": {"source": source}})
         except Exception as e:
-            print(f"❌ Failed to load ViT model: {e}")
+            logger.error("vit_load_failed", extra={"fields": {"model": self.model_name, "error": str(e)}})
             self.model = None
 
+        # 3. Optional reduced-precision inference (see scripts/check_vit_quantization.py)
+        self.precision = self._apply_precision(precision or config.VIT_PRECISION)
+
+    def _vit_source(self):
+        """
+        Returns (path or hub id, from_pretrained kwargs). A snapshot written by
+        scripts/snapshot_vit.py loads memory-mapped from safetensors with no hub lookup.
+        """
+        snapshot_dir = config.VIT_SNAPSHOT_DIR
+        if os.path.isfile(os.path.join(snapshot_dir, "config.json")):
+            return snapshot_dir, {"local_files_only": True}
+        if config.VIT_OFFLINE:
+            raise FileNotFoundError(f"No ViT snapshot at {snapshot_dir} and VIT_OFFLINE is set.")
+        return self.model_name, {}
+
+    def warm_up(self):
+        """Runs the full pipeline once on a synthetic image so the first real request isn't slow."""
+        self.analyze_batch([synthetic_face_jpeg()])
+
+    def _apply_precision(self, precision: str) -> str:
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown ViT precision '{precision}', expected one of {PRECISIONS}")
+        if self.model is None or precision == "fp32":
+            return "fp32"
+
+        if precision == "int8":
+            # Dynamic int8: Linear weights are quantized once, activations per batch
+            self.model = torch.ao.quantization.quantize_dynamic(
+                self.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        elif cpu_supports_bf16():
+            # bf16 weights halve resident memory; inputs are cast to match in classify_pixels
+            self.model = self.model.to(torch.bfloat16)
+        else:
+            logger.warning("vit_precision_fallback", extra={"fields": {"requested": precision, "precision": "fp32", "reason": "no_native_bf16"}})
+            return "fp32"
+
+        logger.info("vit_precision", extra={"fields": {"precision": precision}})
+        return precision
+
     def predict(self, image_bytes: bytes) -> str:
         """
         Processes an image by detecting the face, applying a soft square crop,
         and classifying the face shape.
         """
+        result = self.predict_batch([image_bytes])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def predict_batch(self, images: list[bytes]) -> list:
+        """
+        Classifies several uploads with batched MTCNN detection and a single ViT
+        forward. Returns one label per image, in order; an image that cannot be
+        decoded, detected or cropped gets its Exception in place of a label instead of
+        failing the batch.
+        """
+        return [
+            result if isinstance(result, Exception) else result.face_shape
+            for result in self.analyze_batch(images)
+        ]
+
+    def analyze_batch(self, images: list[bytes], timings: dict = None) -> list:
+        """
+        Same pipeline as predict_batch, returning a FaceAnalysis (or Exception) per image.
+        If `timings` is given, seconds spent per stage (decode, mtcnn_detect, preprocess,
+        vit_forward) are added to it.
+        """
         if not self.model:
             raise Exception("Classifier Model not initialized properly.")
+        timings = {} if timings is None else timings
+
+        results = [None] * len(images)
+        decoded = {}
+        with stage_timer(timings, "decode"):
+            for idx, image_bytes in enumerate(images):
+                try:
+                    decoded[idx] = self._decode(image_bytes)
+                except Exception as e:
+                    results[idx] = e
+
+        # Detection runs on small copies; MTCNN stacks its input, so only copies
+        # of identical size can share a pass
+        by_size = {}
+        detect_copies = {}
+        with stage_timer(timings, "preprocess"):
+            for idx, (image, _) in decoded.items():
+                try:
+                    detect_copies[idx] = self._detection_copy(image)
+                except Exception as e:
+                    results[idx] = e
+                    continue
+                by_size.setdefault(detect_copies[idx][0].size, []).append(idx)
+
+        pixels, crops = {}, {}
+        for owners in by_size.values():
+            with stage_timer(timings, "mtcnn_detect"):
+                detections = self._detect(owners, detect_copies, results)
+            with stage_timer(timings, "preprocess"):
+                for idx, boxes in detections:
+                    try:
+                        scale = detect_copies[idx][1]
+                        boxes = None if boxes is None else boxes * scale # back to decoded-image coordinates
+                        image, to_original = decoded[idx]
+                        crop_box = self._square_crop_box(image.size, boxes)
+                        pixels[idx] = self._to_pixel_values(image, crop_box)
+                        crops[idx] = ([float(v) * to_original for v in crop_box], boxes is not None)
+                    except Exception as e:
+                        results[idx] = e
+
+        owners = sorted(pixels)
+        if owners:
+            pixel_values = torch.stack([pixels[idx] for idx in owners])
+            with stage_timer(timings, "vit_forward"):
+                face_shapes, logits = self.classify_pixels(pixel_values)
+            for row, idx in enumerate(owners):
+                crop_box, face_detected = crops[idx]
+                results[idx] = FaceAnalysis(
+                    face_shape=face_shapes[row],
+                    crop_box=crop_box,
+                    face_detected=face_detected,
+                    logits=logits[row].tolist()
+                )
+        return results
+
+    def _detect(self, owners, detect_copies, results):
+        """
+        One MTCNN pass over same-size copies. If the pass fails, each image is retried
+        alone so only the offending one gets its Exception in `results`.
+        Returns [(idx, boxes)] for the images that were detected.
+        """
+        try:
+            batch_boxes, _ = self.mtcnn.detect([detect_copies[idx][0] for idx in owners])
+            return list(zip(owners, batch_boxes))
+        except Exception as e:
+            if len(owners) == 1:
+                results[owners[0]] = e
+                return []
+
+        detections = []
+        for idx in owners:
+            try:
+                batch_boxes, _ = self.mtcnn.detect([detect_copies[idx][0]])
+                detections.append((idx, batch_boxes[0]))
+            except Exception as e:
+                results[idx] = e
+        return detections
 
-        # Load image and ensure it is RGB (removes Alpha channel from PNGs)
+    def _decode(self, image_bytes: bytes):
+        """
+        Bounded decode: rejects oversized images before decoding pixels, lets JPEG
+        decode at a reduced DCT scale (draft mode), loads the pixels (so the "decode"
+        stage measures the real decode) and shrinks anything still larger than
+        DECODE_MAX_SIDE to fit within it. Nothing beyond that size can reach the 224px
+        ViT anyway.
+        Returns (image, scale factor from decoded back to original pixels).
+        """
         image = Image.open(io.BytesIO(image_bytes))
+        original_width = image.width
+        if image.width * image.height > config.MAX_IMAGE_PIXELS:
+            raise ValueError(f"Image is too large ({image.width}x{image.height}).")
+
+        max_side = config.DECODE_MAX_SIDE
+        if image.format == "JPEG":
+            image.draft("RGB", (max_side, max_side))
+
+        # Image.open is lazy: force the pixels here so a truncated or corrupt upload
+        # fails inside the caller's per-image try instead of in a later batched stage
+        image.load()
+
+        # Ensure it is RGB (removes Alpha channel from PNGs)
         if image.mode != "RGB":
             image = image.convert("RGB")
 
-        boxes, _ = self.mtcnn.detect(image)
+        # Cheap integer box reduction first, then an exact resize down to the cap
+        factor = max(image.size) // max_side
+        if factor >= 2:
+            image = image.reduce(factor)
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.BILINEAR)
+        return image, original_width / image.width
+
+    def _detection_copy(self, image: Image.Image):
+        """Returns (copy no larger than DETECT_MAX_SIDE, scale factor back to `image`)."""
+        max_side = config.DETECT_MAX_SIDE
+        longest = max(image.size)
+        if longest <= max_side:
+            return image, 1.0
+
+        scale = longest / max_side
+        size = (max(1, round(image.width / scale)), max(1, round(image.height / scale)))
+        return image.resize(size, Image.BILINEAR), scale
+
+    def _square_crop_box(self, image_size, boxes):
+        """Soft square crop box around the most prominent face, or the whole image if none."""
+        img_w, img_h = image_size
+        if boxes is None:
+            return (0, 0, img_w, img_h) # Fallback to original if detection fails
+
+        box = boxes[0] # Coordinates of the most prominent face [x1, y1, x2, y2]
         
-        processed_image = image # Fallback to original if detection fails
+        # This prevents vertical stretching which causes "Oblong" hallucinations
+        w = box[2] - box[0]
+        h = box[3] - box[1]
+        cx = (box[0] + box[2]) / 2
+        cy = (box[1] + box[3]) / 2
         
-        if boxes is not None:
-            box = boxes[0] # Coordinates of the most prominent face [x1, y1, x2, y2]
-            
-            # This prevents vertical stretching which causes "Oblong" hallucinations
-            w = box[2] - box[0]
-            h = box[3] - box[1]
-            cx = (box[0] + box[2]) / 2
-            cy = (box[1] + box[3]) / 2
-            
-            # MARGIN CONTROL: 1.4 expands the box by 40% to include hair and ears
-            # Lower this (e.g., 1.2) for a tighter crop, increase for a looser one.
-            margin_factor = 1.2
-            side = max(w, h) * margin_factor
-            
-            img_w, img_h = image.size
-            new_box = [
-                max(0, cx - side/2), 
-                max(0, cy - side/2), 
-                min(img_w, cx + side/2), 
-                min(img_h, cy + side/2)
-            ]
-            
-            processed_image = image.crop(new_box)
-            
-        inputs = self.processor(images=processed_image, return_tensors="pt")
+        # MARGIN CONTROL: 1.4 expands the box by 40% to include hair and ears
+        # Lower this (e.g., 1.2) for a tighter crop, increase for a looser one.
+        margin_factor = 1.2
+        side = max(w, h) * margin_factor
         
+        return (
+            max(0, cx - side/2), 
+            max(0, cy - side/2), 
+            min(img_w, cx + side/2), 
+            min(img_h, cy + side/2)
+        )
+
+    def _to_pixel_values(self, image: Image.Image, crop_box) -> torch.Tensor:
+        """
+        Crop + resize in a single PIL call, then rescale and normalize as tensors.
+        Equivalent to ViTImageProcessor on the cropped image, without a second PIL pass.
+        """
+        size = self.processor.size
+        face = image.resize((size["width"], size["height"]), Image.BILINEAR, box=tuple(float(v) for v in crop_box))
+
+        pixels = torch.from_numpy(np.asarray(face, dtype=np.float32)).permute(2, 0, 1)
+        pixels = pixels * self.processor.rescale_factor
+        return (pixels - self._pixel_mean) / self._pixel_std
+
+    def classify_pixels(self, pixel_values: torch.Tensor):
+        """Runs one batched ViT forward over preprocessed (B, 3, H, W) faces. Returns (labels, logits)."""
+        if not self.model:
+            raise Exception("Classifier Model not initialized properly.")
+
+        if self.precision == "bf16":
+            pixel_values = pixel_values.to(torch.bfloat16)
+
         with torch.no_grad():
-            outputs = self.model(**inputs)
+            outputs = self.model(pixel_values=pixel_values)
             
-        logits = outputs.logits
-        predicted_class_idx = logits.argmax(-1).item()
-        
-        raw_label = self.model.config.id2label[predicted_class_idx]
+        logits = outputs.logits.float()
+        predicted_class_ids = logits.argmax(-1).tolist()
         
-        final_shape = raw_label.capitalize()
-        print(f"🎯 AI Prediction: {final_shape}")
+        final_shapes = [self.model.config.id2label[idx].capitalize() for idx in predicted_class_ids]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("prediction", extra={"fields": {"face_shapes": final_shapes}})
         
-        return final_shape
+        return final_shapes, logits
+
+_classifier = None
+_classifier_lock = threading.Lock()
 
-classifier_service = FaceShapeClassifier()
\ No newline at end of file
+def get_classifier() -> FaceShapeClassifier:
+    """Process-wide classifier, built on first use instead of at import time."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = FaceShapeClassifier()
+    return _classifier
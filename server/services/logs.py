@@ -0,0 +1,46 @@
+# server/services/logs.py
+import json
+import logging
+import sys
+import time
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, event and any `fields` passed via extra=."""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            **getattr(record, "fields", {})
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable variant of JsonFormatter for local development."""
+    def format(self, record):
+        fields = " ".join(f"{key}={value}" for key, value in getattr(record, "fields", {}).items())
+        stamp = time.strftime("%H:%M:%S", time.localtime(record.created))
+        line = f"{stamp} {record.levelname:<7} {record.name}: {record.getMessage()} {fields}".rstrip()
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+def configure_logging(level="INFO", fmt="json"):
+    """
+    Installs a single stderr handler on the "spectacular" logger tree. Hot paths log at
+    DEBUG behind isEnabledFor checks, so nothing is formatted unless that level is on.
+    """
+    logger = logging.getLogger("spectacular")
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    if not logger.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        logger.addHandler(handler)
+    return logger
+
+def get_logger(name):
+    return logging.getLogger(f"spectacular.{name}")
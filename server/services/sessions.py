@@ -0,0 +1,46 @@
+# server/services/sessions.py
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from services.analysis import FaceAnalysis
+
+class SessionStore:
+    """
+    Bounded, expiring in-memory map of session token -> FaceAnalysis. A session keeps
+    the classified face (shape and crop) so /rerank can re-score new measurements
+    without the vision pipeline. Reads extend the expiry; past max_sessions the least
+    recently used session is dropped. Sessions are per process, so with several server
+    workers a /rerank that lands elsewhere gets a 404 and the client re-uploads.
+    """
+    def __init__(self, max_sessions, ttl_seconds):
+        self.max_sessions = max_sessions
+        self.ttl = ttl_seconds
+        self._sessions = OrderedDict() # token -> (expires_at, analysis)
+        self._lock = threading.Lock()
+
+    def create(self, analysis: FaceAnalysis) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[token] = (time.monotonic() + self.ttl, analysis)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return token
+
+    def get(self, token: str):
+        """The session's FaceAnalysis, or None if it never existed or has expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            expires_at, analysis = entry
+            if expires_at < now:
+                del self._sessions[token]
+                return None
+            self._sessions[token] = (now + self.ttl, analysis)
+            self._sessions.move_to_end(token)
+            return analysis
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,151 @@
+# server/services/vision_pool.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import torch
+import config
+from services.logs import configure_logging
+from services.metrics import STAGE_SECONDS
+
+# Each worker (process or thread) keeps its own loaded classifier here
+_worker = threading.local()
+
+def _init_worker(mode, num_threads):
+    from services import classifier
+
+    if mode == "process":
+        # Spawned interpreters start without the parent's logging setup
+        configure_logging(config.LOG_LEVEL, config.LOG_FORMAT)
+        torch.set_num_threads(num_threads)
+        # A fresh process owns the process-wide classifier exclusively
+        _worker.classifier = classifier.get_classifier()
+    elif mode == "shared":
+        # Preloaded before the server forked; every thread uses the same copy-on-write weights
+        _worker.classifier = classifier.get_classifier()
+    else:
+        _worker.classifier = classifier.FaceShapeClassifier()
+
+    # A worker without a ViT can't serve: failing the initializer breaks the pool, so
+    # warm_up() raises and /ready stays 503 instead of reporting vision as ready
+    if _worker.classifier.model is None:
+        raise RuntimeError("Vision worker could not load the ViT model.")
+    # Warm here rather than in a submitted task: tasks aren't bound to workers, so a
+    # worker that finished initializing early could take every warm-up task
+    _worker.classifier.warm_up()
+
+def _worker_identity():
+    """Runs after this worker's initializer (load + warm-up) has returned."""
+    return os.getpid(), threading.get_ident()
+
+def _analyze_images(images):
+    """
+    Decode, MTCNN detect, crop and ViT for a list of uploads. Runs inside a worker and
+    returns (results, per-stage seconds) so the timings can be exported by the parent.
+    """
+    timings = {}
+    return _worker.classifier.analyze_batch(images, timings), timings
+
+class VisionWorkerPool:
+    """
+    Runs the image pipeline in a dedicated pool so the event loop only awaits a future.
+
+    mode="process" starts `workers` spawned processes, each holding its own MTCNN + ViT
+    and pinned to an equal share of `total_threads` torch intra-op threads.
+    mode="thread" keeps one classifier per thread inside this process; torch's
+    intra-op pool is process-wide, so it is sized to one worker's share.
+    mode="shared" is the thread pool over a single process-wide classifier, used when
+    models were preloaded in a master process and inherited by forked server workers.
+
+    An optional ClassificationCache is consulted here, in the calling process, so
+    repeated uploads never reach a worker.
+    """
+    def __init__(self, mode="process", workers=2, total_threads=None, cache=None):
+        if mode not in ("process", "thread", "shared"):
+            raise ValueError(f"Unknown vision pool mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        total_threads = total_threads or os.cpu_count() or 1
+        self.threads_per_worker = max(1, total_threads // self.workers)
+        self.cache = cache
+        self._executor = None
+
+    def start(self):
+        if self._executor is not None:
+            return
+        if self.mode == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # fork after torch/OpenMP initialisation can deadlock, so always spawn
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.mode, self.threads_per_worker)
+            )
+        else:
+            torch.set_num_threads(self.threads_per_worker)
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="vision",
+                initializer=_init_worker,
+                initargs=(self.mode, self.threads_per_worker)
+            )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def warm_up(self):
+        """
+        Returns once every worker has loaded and warmed its classifier. Warm-up itself
+        happens in each worker's initializer; tasks only prove an initializer returned.
+        The first round of one task per worker makes the executor start all of them,
+        since none is idle yet; further rounds run until every worker has answered.
+        """
+        if self._executor is None:
+            raise RuntimeError("VisionWorkerPool has not been started.")
+        loop = asyncio.get_running_loop()
+        ready = set()
+        while True:
+            ready.update(await asyncio.gather(*[
+                loop.run_in_executor(self._executor, _worker_identity) for _ in range(self.workers)
+            ]))
+            if len(ready) >= self.workers:
+                return
+            await asyncio.sleep(0.1) # some worker is still in its initializer
+
+    async def analyze(self, images):
+        """Returns one FaceAnalysis (or Exception) per image, in order."""
+        if self._executor is None:
+            raise RuntimeError("VisionWorkerPool has not been started.")
+        images = list(images)
+        results = [None] * len(images)
+
+        keys = None
+        if self.cache is not None:
+            # Hashing multi-MB uploads and disk lookups stay off the event loop too
+            keys, cached = await asyncio.to_thread(self._cache_lookup, images)
+            for idx, analysis in enumerate(cached):
+                results[idx] = analysis
+
+        misses = [idx for idx, result in enumerate(results) if result is None]
+        if misses:
+            loop = asyncio.get_running_loop()
+            fresh, timings = await loop.run_in_executor(self._executor, _analyze_images, [images[idx] for idx in misses])
+            for stage, seconds in timings.items():
+                STAGE_SECONDS.observe(seconds, stage=stage)
+            for idx, result in zip(misses, fresh):
+                results[idx] = result
+            if keys is not None:
+                await asyncio.to_thread(self._cache_store, [(keys[idx], results[idx]) for idx in misses])
+        return results
+
+    def _cache_lookup(self, images):
+        keys = [self.cache.key_for(image_bytes) for image_bytes in images]
+        return keys, [self.cache.get(key) for key in keys]
+
+    def _cache_store(self, entries):
+        for key, result in entries:
+            if not isinstance(result, Exception):
+                self.cache.put(key, result)
@@ -0,0 +1,121 @@
+import argparse
+import os
+import sys
+import torch
+import torch.nn as nn
+
+# Ensure it can find the models folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from models.model import HybridNeuMF, HybridNeuMFScorer, load_hybrid_neumf
+from database.catalog import GlassesCatalog
+
+# --- CONFIGURATION ---
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DB_PATH = os.path.join(SERVER_DIR, "database", "glasses_database.json")
+# max |HybridNeuMF.forward - scorer| allowed, relative to the largest |score| (at least 1);
+# the factorized sums reassociate float32 additions, so exact equality isn't expected
+TOLERANCE = 1e-4
+TABLE_MODES = {
+    "pair_pre": None,           # default budget: per-shape (shapes x items x hidden) table
+    "item_pre+shape_pre": 0,    # no budget: per-request sum of the item and shape tables
+}
+
+def randomize(model, generator):
+    """
+    Moves a freshly initialised model away from the defaults that would hide folding
+    bugs: zero biases, unit BatchNorm statistics and near-zero embeddings.
+    """
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, nn.Embedding):
+                module.weight.normal_(0.0, 0.5, generator=generator)
+            elif isinstance(module, nn.Linear) and module.bias is not None:
+                module.bias.normal_(0.0, 0.1, generator=generator)
+            elif isinstance(module, nn.BatchNorm1d):
+                module.running_mean.normal_(0.0, 0.5, generator=generator)
+                module.running_var.uniform_(0.5, 2.0, generator=generator)
+                module.weight.uniform_(0.5, 1.5, generator=generator)
+                module.bias.normal_(0.0, 0.1, generator=generator)
+    return model.eval()
+
+def reference_scores(model, face_shape_id, client_features, item_features, item_ids):
+    """(B, N) scores from the training-time HybridNeuMF.forward, one (shape, item) pair per row."""
+    batch, num, num_client_features = client_features.shape
+    shapes = face_shape_id.unsqueeze(1).expand(batch, num).reshape(-1)
+    items = item_ids.reshape(-1)
+    with torch.no_grad():
+        scores = model(shapes, items, client_features.reshape(-1, num_client_features), item_features[items])
+    return scores.reshape(batch, num)
+
+def max_error(actual, expected):
+    return ((actual - expected).abs().max() / expected.abs().max().clamp(min=1.0)).item()
+
+def check_scorer(model, item_features, max_table_bytes=None, candidates=16, generator=None):
+    """
+    Builds a HybridNeuMFScorer in one table mode and returns the max error of forward
+    (every shape against the whole catalog) and score_candidates against
+    HybridNeuMF.forward in eval mode, relative to the largest |score| (at least 1).
+    """
+    kwargs = {} if max_table_bytes is None else {"max_table_bytes": max_table_bytes}
+    scorer = HybridNeuMFScorer(model, item_features, **kwargs)
+    hparams = model.hparams
+    num_items = hparams.num_items
+
+    face_shape_id = torch.arange(hparams.num_face_shapes)
+    batch = face_shape_id.shape[0]
+    client_features = torch.rand(batch, num_items, hparams.num_client_features, generator=generator) * 2
+    all_items = torch.arange(num_items).expand(batch, num_items)
+    with torch.no_grad():
+        actual = scorer(face_shape_id, client_features)
+    full_error = max_error(actual, reference_scores(model, face_shape_id, client_features, item_features, all_items))
+
+    item_ids = torch.randint(0, num_items, (batch, candidates), generator=generator)
+    client_features = torch.rand(batch, candidates, hparams.num_client_features, generator=generator) * 2
+    with torch.no_grad():
+        actual = scorer.score_candidates(face_shape_id, client_features, item_ids)
+    candidate_error = max_error(actual, reference_scores(model, face_shape_id, client_features, item_features, item_ids))
+
+    return {
+        "per_shape_table": scorer.per_shape_table,
+        "forward": full_error,
+        "score_candidates": candidate_error
+    }
+
+def load_subject(args, generator):
+    """(model, item_features): a trained checkpoint on the real catalog, or random weights."""
+    if args.model:
+        catalog = GlassesCatalog.load(args.db)
+        return load_hybrid_neumf(args.model), catalog.item_feature_tensor.to(torch.float32)
+    model = HybridNeuMF(num_face_shapes=5, num_items=args.items)
+    item_features = torch.rand(args.items, model.hparams.num_item_features, generator=generator)
+    return randomize(model, generator), item_features
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity of the factorized HybridNeuMFScorer against HybridNeuMF.forward.")
+    parser.add_argument("--items", type=int, default=300, help="Catalog size for the random-weight model")
+    parser.add_argument("--model", default=None, help="Check a trained checkpoint (with --db) instead of random weights")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(args.seed)
+    model, item_features = load_subject(args, generator)
+
+    print("\n" + "="*50)
+    print(" FACTORIZED SCORER PARITY (vs HybridNeuMF.forward)")
+    print("="*50)
+    failed = False
+    for mode, max_table_bytes in TABLE_MODES.items():
+        result = check_scorer(model, item_features, max_table_bytes, generator=generator)
+        expected_table = max_table_bytes is None
+        ok = (
+            result["per_shape_table"] == expected_table
+            and result["forward"] <= args.tolerance
+            and result["score_candidates"] <= args.tolerance
+        )
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {mode:<20} forward={result['forward']:.2e} "
+              f"score_candidates={result['score_candidates']:.2e} per_shape_table={result['per_shape_table']}")
+
+    sys.exit(1 if failed else 0)